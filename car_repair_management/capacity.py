@@ -0,0 +1,219 @@
+"""Technician capacity from holiday lists and shift assignments.
+
+Builds an employee x day matrix of available hours and reduces it against the
+hours logged on submitted Timesheets:
+
+- every day starts at the employee's default shift length (DEFAULT_SHIFT_HOURS
+  without HRMS or a default shift)
+- active Shift Assignments override the hours for the days they cover
+- days on the employee's holiday list (or the company's default list) and
+  days before joining / after relieving are zeroed
+
+NumPy is used when installed (`pip install car_repair_management[capacity]`);
+otherwise the same matrix is reduced in plain Python.
+"""
+from datetime import timedelta
+
+import frappe
+from frappe.utils import add_days, date_diff, flt, getdate, today
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_SHIFT_HOURS = 8.0
+DEFAULT_PERIOD_DAYS = 7
+
+
+def get_period(filters):
+    """(from_date, to_date) from report filters; defaults to the last DEFAULT_PERIOD_DAYS days."""
+    to_date = getdate(filters.get("to_date") or today())
+    from_date = getdate(filters.get("from_date") or add_days(to_date, -(DEFAULT_PERIOD_DAYS - 1)))
+    if from_date > to_date:
+        frappe.throw("From Date cannot be after To Date")
+    return from_date, to_date
+
+
+def get_utilization(from_date, to_date, employee=None):
+    """Rows of {employee, capacity, logged, utilization} for employees with time logged in the period."""
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    logs = _get_logged_hours(from_date, to_date, employee)
+    employees = sorted({row.employee for row in logs} | ({employee} if employee else set()))
+    if not employees:
+        return []
+
+    capacity, logged = _reduce(employees, from_date, to_date, logs)
+    return [
+        frappe._dict(
+            employee=emp,
+            capacity=flt(capacity[idx], 2),
+            logged=flt(logged[idx], 2),
+            utilization=flt(logged[idx] * 100.0 / capacity[idx], 2) if capacity[idx] else 0,
+        )
+        for idx, emp in enumerate(employees)
+    ]
+
+
+def get_capacity(employees, from_date, to_date):
+    """{employee: available hours} over the period."""
+    employees = list(employees)
+    capacity, _logged = _reduce(employees, getdate(from_date), getdate(to_date), [])
+    return {emp: flt(capacity[idx], 2) for idx, emp in enumerate(employees)}
+
+
+def _reduce(employees, from_date, to_date, logs):
+    """Per-employee (capacity, logged) sums over the availability matrix."""
+    days = date_diff(to_date, from_date) + 1
+    emp_idx = {emp: idx for idx, emp in enumerate(employees)}
+    details = _get_employee_details(employees)
+
+    base = [_default_hours(details.get(emp)) for emp in employees]
+    spans = []  # (row, first_day, last_day, hours) overrides and zeroed ranges
+    for emp, d in details.items():
+        row = emp_idx[emp]
+        if d.date_of_joining and getdate(d.date_of_joining) > from_date:
+            spans.append((row, 0, min(date_diff(d.date_of_joining, from_date), days), 0.0))
+        if d.relieving_date and getdate(d.relieving_date) < to_date:
+            spans.append((row, max(date_diff(d.relieving_date, from_date) + 1, 0), days, 0.0))
+    shift_spans = []
+    for sa in _get_shift_assignments(employees, from_date, to_date):
+        first = max(date_diff(sa.start_date, from_date), 0)
+        last = days if not sa.end_date else min(date_diff(sa.end_date, from_date) + 1, days)
+        shift_spans.append((emp_idx[sa.employee], first, last, _shift_hours(sa)))
+
+    holiday_lists = sorted({d.holiday_list for d in details.values() if d.holiday_list})
+    list_pos = {name: idx for idx, name in enumerate(holiday_lists)}
+    holidays = [(list_pos[name], day) for name, day in _get_holidays(holiday_lists, from_date, to_date)]
+    list_of = [list_pos.get((details.get(emp) or {}).get("holiday_list"), -1) for emp in employees]
+    log_cells = [(emp_idx[r.employee], date_diff(r.log_date, from_date), flt(r.hours)) for r in logs
+                 if r.employee in emp_idx and 0 <= date_diff(r.log_date, from_date) < days]
+
+    if np is not None:
+        return _reduce_numpy(len(employees), days, base, shift_spans + spans, len(holiday_lists), holidays, list_of, log_cells)
+    return _reduce_python(len(employees), days, base, shift_spans + spans, len(holiday_lists), holidays, list_of, log_cells)
+
+
+def _reduce_numpy(n_emp, days, base, spans, n_lists, holidays, list_of, log_cells):
+    avail = np.repeat(np.asarray(base, dtype=float)[:, None], days, axis=1)
+    # Shift overrides first, then joining/relieving zeroes
+    for row, first, last, hours in spans:
+        avail[row, first:last] = hours
+
+    if holidays:
+        off = np.zeros((n_lists + 1, days), dtype=bool)  # last row: no holiday list
+        list_idx, day_idx = (np.asarray(v) for v in zip(*holidays))
+        off[list_idx, day_idx] = True
+        avail[off[np.asarray(list_of)]] = 0.0
+
+    logged = np.zeros((n_emp, days))
+    if log_cells:
+        rows, cols, hours = (np.asarray(v) for v in zip(*log_cells))
+        np.add.at(logged, (rows, cols), hours)
+    return avail.sum(axis=1), logged.sum(axis=1)
+
+
+def _reduce_python(n_emp, days, base, spans, n_lists, holidays, list_of, log_cells):
+    avail = [[hours] * days for hours in base]
+    for row, first, last, hours in spans:
+        avail[row][first:last] = [hours] * max(last - first, 0)
+
+    off = {}
+    for list_idx, day in holidays:
+        off.setdefault(list_idx, set()).add(day)
+    for row, list_idx in enumerate(list_of):
+        for day in off.get(list_idx, ()):
+            avail[row][day] = 0.0
+
+    logged = [0.0] * n_emp
+    for row, _day, hours in log_cells:
+        logged[row] += hours
+    return [sum(r) for r in avail], logged
+
+
+def _get_logged_hours(from_date, to_date, employee=None):
+    conditions = ["ts.docstatus = 1", "tl.from_time >= %(from_date)s", "tl.from_time < %(to_date)s"]
+    values = {"from_date": from_date, "to_date": add_days(to_date, 1)}
+    if employee:
+        conditions.append("ts.employee = %(employee)s")
+        values["employee"] = employee
+    return frappe.db.sql(
+        f"""
+        select ts.employee, date(tl.from_time) as log_date, sum(tl.hours) as hours
+        from `tabTimesheet` ts
+        join `tabTimesheet Detail` tl on tl.parent = ts.name
+        where {" and ".join(conditions)} and ifnull(ts.employee, '') != ''
+        group by ts.employee, date(tl.from_time)
+        """,
+        values,
+        as_dict=True,
+    )
+
+
+def _get_employee_details(employees):
+    """{employee: {holiday_list, date_of_joining, relieving_date, default_shift hours}}."""
+    has_default_shift = frappe.get_meta("Employee").has_field("default_shift")
+    shift_join, shift_cols = "", "null as start_time, null as end_time"
+    if has_default_shift and frappe.db.table_exists("Shift Type"):
+        shift_join = "left join `tabShift Type` st on st.name = e.default_shift"
+        shift_cols = "st.start_time, st.end_time"
+    rows = frappe.db.sql(
+        f"""
+        select e.name, e.date_of_joining, e.relieving_date,
+            coalesce(nullif(e.holiday_list, ''), c.default_holiday_list) as holiday_list,
+            {shift_cols}
+        from `tabEmployee` e
+        left join `tabCompany` c on c.name = e.company
+        {shift_join}
+        where e.name in %(employees)s
+        """,
+        {"employees": tuple(employees)},
+        as_dict=True,
+    )
+    return {row.name: row for row in rows}
+
+
+def _get_shift_assignments(employees, from_date, to_date):
+    # Shift Assignment comes with HRMS; without it every day uses the default hours
+    if not frappe.db.table_exists("Shift Assignment"):
+        return []
+    return frappe.db.sql(
+        """
+        select sa.employee, sa.start_date, sa.end_date, st.start_time, st.end_time
+        from `tabShift Assignment` sa
+        join `tabShift Type` st on st.name = sa.shift_type
+        where sa.docstatus = 1 and sa.status = 'Active' and sa.employee in %(employees)s
+            and sa.start_date <= %(to_date)s and (sa.end_date is null or sa.end_date >= %(from_date)s)
+        order by sa.start_date
+        """,
+        {"employees": tuple(employees), "from_date": from_date, "to_date": to_date},
+        as_dict=True,
+    )
+
+
+def _get_holidays(holiday_lists, from_date, to_date):
+    """[(holiday_list, day offset)] for the period."""
+    if not holiday_lists:
+        return []
+    rows = frappe.db.sql(
+        """
+        select parent, holiday_date
+        from `tabHoliday`
+        where parenttype = 'Holiday List' and parent in %(lists)s
+            and holiday_date between %(from_date)s and %(to_date)s
+        """,
+        {"lists": tuple(holiday_lists), "from_date": from_date, "to_date": to_date},
+    )
+    return [(parent, date_diff(holiday_date, from_date)) for parent, holiday_date in rows]
+
+
+def _default_hours(details):
+    if details and details.start_time is not None and details.end_time is not None:
+        return _shift_hours(details)
+    return DEFAULT_SHIFT_HOURS
+
+
+def _shift_hours(shift):
+    """Length of a shift in hours; shifts ending after midnight wrap around."""
+    span = (shift.end_time - shift.start_time) % timedelta(days=1)
+    return span.total_seconds() / 3600.0 or DEFAULT_SHIFT_HOURS
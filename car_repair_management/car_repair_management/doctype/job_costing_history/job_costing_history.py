@@ -0,0 +1,113 @@
+"""Date-keyed Repair Order cost history.
+
+One row per RO per day, written only on days when a cost value changed, so a
+value on any date is the latest row on or before it.
+"""
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate, now, today
+
+HISTORY_FIELDS = ("parts_cost", "labor_cost", "other_charges", "total_job_cost", "invoiced_amount", "gross_margin")
+
+
+class JobCostingHistory(Document):
+    pass
+
+
+def record_cost_history(ro_names, snapshot_date=None):
+    """Store today's costs for `ro_names` where they differ from the previous stored day."""
+    if not ro_names:
+        return
+    snapshot_date = str(getdate(snapshot_date or today()))
+    values = {"names": tuple(ro_names), "date": snapshot_date, "now": now(), "user": frappe.session.user}
+    unchanged = " and ".join(f"prev.{f} = ifnull(ro.{f}, 0)" for f in HISTORY_FIELDS)
+    frappe.db.sql(
+        f"""
+        insert into `tabJob Costing History`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             repair_order, snapshot_date, {", ".join(HISTORY_FIELDS)})
+        select concat(ro.name, '-', %(date)s), %(now)s, %(now)s, %(user)s, %(user)s, 0, 0,
+            ro.name, %(date)s, {", ".join(f"ifnull(ro.{f}, 0)" for f in HISTORY_FIELDS)}
+        from `tabRepair Order` ro
+        left join `tabJob Costing History` prev on prev.name = (
+            select h.name from `tabJob Costing History` h
+            where h.repair_order = ro.name and h.snapshot_date < %(date)s
+            order by h.snapshot_date desc limit 1
+        )
+        left join `tabJob Costing History` cur on cur.name = concat(ro.name, '-', %(date)s)
+        where ro.name in %(names)s
+            and (prev.name is null or cur.name is not null or not ({unchanged}))
+        on duplicate key update
+            {", ".join(f"{f} = values({f})" for f in HISTORY_FIELDS)},
+            modified = values(modified)
+        """,
+        values,
+    )
+
+
+def delete_cost_history(doc, method=None):
+    """Repair Order on_trash: drop the history of a deleted draft, which would otherwise block the delete."""
+    frappe.db.delete("Job Costing History", {"repair_order": doc.name})
+
+
+@frappe.whitelist()
+def get_cost_history(repair_order, from_date=None, to_date=None):
+    """Cost rows for one RO in a date range, led by the row in effect on `from_date`."""
+    frappe.has_permission("Repair Order", "read", repair_order, throw=True)
+    fields = ["snapshot_date", *HISTORY_FIELDS]
+    filters = [["repair_order", "=", repair_order]]
+    rows = []
+    if from_date:
+        filters.append(["snapshot_date", ">", from_date])
+        rows = frappe.get_all(
+            "Job Costing History",
+            filters=[["repair_order", "=", repair_order], ["snapshot_date", "<=", from_date]],
+            fields=fields,
+            order_by="snapshot_date desc",
+            limit=1,
+        )
+    if to_date:
+        filters.append(["snapshot_date", "<=", to_date])
+    rows += frappe.get_all("Job Costing History", filters=filters, fields=fields, order_by="snapshot_date asc")
+    return rows
+
+
+@frappe.whitelist()
+def get_costs_as_of(date, repair_orders=None):
+    """Costs of every RO (or of `repair_orders`) as they stood on `date`, plus totals."""
+    frappe.has_permission("Job Costing History", "read", throw=True)
+    if isinstance(repair_orders, str):
+        repair_orders = frappe.parse_json(repair_orders)
+    conditions, values = "", {"date": getdate(date)}
+    if repair_orders:
+        conditions, values["names"] = "and repair_order in %(names)s", tuple(repair_orders)
+    rows = frappe.db.sql(
+        f"""
+        select h.repair_order, h.snapshot_date, {", ".join(f"h.{f}" for f in HISTORY_FIELDS)}
+        from `tabJob Costing History` h
+        join (
+            select repair_order, max(snapshot_date) as snapshot_date
+            from `tabJob Costing History`
+            where snapshot_date <= %(date)s {conditions}
+            group by repair_order
+        ) latest on latest.repair_order = h.repair_order and latest.snapshot_date = h.snapshot_date
+        """,
+        values,
+        as_dict=True,
+    )
+    totals = {f: sum(r[f] or 0 for r in rows) for f in HISTORY_FIELDS}
+    return {"rows": rows, "totals": totals}
+
+
+@frappe.whitelist()
+def get_margin_drift(repair_order, from_date=None, to_date=None):
+    """Chart data of cost and margin over the life of an RO."""
+    rows = get_cost_history(repair_order, from_date, to_date)
+    return {
+        "labels": [str(r.snapshot_date) for r in rows],
+        "datasets": [
+            {"name": "Total Job Cost", "values": [r.total_job_cost for r in rows]},
+            {"name": "Invoiced", "values": [r.invoiced_amount for r in rows]},
+            {"name": "Gross Margin", "values": [r.gross_margin for r in rows]},
+        ],
+    }
@@ -0,0 +1,34 @@
+# Copyright (c) 2025, Selfmade Cloud Solutions and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+
+from car_repair_management.car_repair_management.doctype.job_costing_history.job_costing_history import (
+	get_costs_as_of,
+	record_cost_history,
+)
+from car_repair_management.tests.test_repair_order import make_repair_order
+
+
+class TestJobCostingHistory(FrappeTestCase):
+	def test_rows_only_on_changed_days(self):
+		ro = make_repair_order()
+		day1, day2, day3 = today(), add_days(today(), 1), add_days(today(), 2)
+		frappe.db.set_value("Repair Order", ro.name, "total_job_cost", 100)
+		record_cost_history([ro.name], day1)
+		record_cost_history([ro.name], day2)
+		frappe.db.set_value("Repair Order", ro.name, "total_job_cost", 250)
+		record_cost_history([ro.name], day3)
+
+		rows = frappe.get_all(
+			"Job Costing History",
+			filters={"repair_order": ro.name},
+			fields=["snapshot_date", "total_job_cost"],
+			order_by="snapshot_date",
+		)
+		self.assertEqual([(str(r.snapshot_date), r.total_job_cost) for r in rows], [(day1, 100), (day3, 250)])
+
+		as_of = get_costs_as_of(day2, [ro.name])
+		self.assertEqual(as_of["totals"]["total_job_cost"], 100)
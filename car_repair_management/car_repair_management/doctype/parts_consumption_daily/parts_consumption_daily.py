@@ -0,0 +1,127 @@
+"""Daily parts consumption per Repair Order, item and billable flag.
+
+Maintained from Stock Entry submit/cancel so the parts consumption reports
+and the Billable vs FoC chart aggregate a small rollup instead of every Stock
+Entry Detail row. Row names are derived from the key so postings upsert.
+
+The billable flag is taken from the RO's parts plan when the Stock Entry is
+submitted and stored on its rows (Stock Entry Detail.is_billable), so a
+cancel reverses the same rollup rows even if the plan changed since.
+"""
+import frappe
+from frappe.model.document import Document
+from frappe.utils import cint, flt, now
+
+# Deterministic row name for (posting_date, repair_order, item_code, is_billable)
+ROW_NAME = "md5(concat_ws('|', {posting_date}, {repair_order}, {item_code}, {is_billable}))"
+
+
+class PartsConsumptionDaily(Document):
+    pass
+
+
+def stamp_billable_flags(doc, method=None):
+    """Stock Entry before_submit: store each row's billable flag as it will be posted."""
+    if not doc.get("repair_order"):
+        return
+    billable = _billable_flags(doc.repair_order, list({d.item_code for d in doc.get("items") if d.item_code}))
+    for d in doc.get("items"):
+        if d.item_code:
+            d.is_billable = billable.get(d.item_code, 1)
+
+
+def update_parts_consumption(doc, method=None):
+    """Stock Entry on_submit / on_cancel: add or reverse its issued parts."""
+    if not doc.get("repair_order"):
+        return
+    sign = -1 if doc.docstatus == 2 else 1
+
+    totals = {}
+    for d in doc.get("items"):
+        if not d.item_code:
+            continue
+        key = (d.item_code, cint(d.get("is_billable")))
+        qty, amount = totals.get(key, (0.0, 0.0))
+        totals[key] = (qty + flt(d.qty), amount + flt(d.qty) * flt(d.valuation_rate))
+    if not totals:
+        return
+
+    values = {"posting_date": doc.posting_date, "repair_order": doc.repair_order, "now": now(), "user": frappe.session.user}
+    rows = []
+    for idx, ((item_code, is_billable), (qty, amount)) in enumerate(totals.items()):
+        values.update({f"item_{idx}": item_code, f"flag_{idx}": is_billable,
+                       f"qty_{idx}": sign * qty, f"amount_{idx}": sign * amount})
+        name = ROW_NAME.format(
+            posting_date="%(posting_date)s", repair_order="%(repair_order)s",
+            item_code=f"%(item_{idx})s", is_billable=f"%(flag_{idx})s",
+        )
+        rows.append(
+            f"({name}, %(now)s, %(now)s, %(user)s, %(user)s, 0, 0, %(posting_date)s, %(repair_order)s, "
+            f"%(item_{idx})s, %(flag_{idx})s, %(qty_{idx})s, %(amount_{idx})s)"
+        )
+
+    frappe.db.sql(
+        f"""
+        insert into `tabParts Consumption Daily`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             posting_date, repair_order, item_code, is_billable, qty, amount)
+        values {", ".join(rows)}
+        on duplicate key update
+            qty = qty + values(qty),
+            amount = amount + values(amount),
+            modified = values(modified)
+        """,
+        values,
+    )
+    if sign < 0:
+        # A fully reversed day carries no information
+        frappe.db.sql(
+            """
+            delete from `tabParts Consumption Daily`
+            where repair_order = %s and posting_date = %s and qty = 0 and amount = 0
+            """,
+            (doc.repair_order, doc.posting_date),
+        )
+
+
+def _billable_flags(repair_order, item_codes):
+    """{item_code: 0/1} from the RO's parts plan; items not planned count as billable."""
+    return dict(frappe.db.sql(
+        """
+        select item_code, max(case when is_billable = 1 then 1 else 0 end)
+        from `tabRepair Parts Plan`
+        where parent = %s and parenttype = 'Repair Order' and item_code in %s
+        group by item_code
+        """,
+        (repair_order, tuple(item_codes)),
+    ))
+
+
+@frappe.whitelist()
+def rebuild_parts_consumption():
+    """Recreate the rollup from submitted Stock Entries in one set-based statement."""
+    frappe.only_for("System Manager")
+    frappe.db.delete("Parts Consumption Daily")
+    name = ROW_NAME.format(
+        posting_date="t.posting_date", repair_order="t.repair_order",
+        item_code="t.item_code", is_billable="t.is_billable",
+    )
+    frappe.db.sql(
+        f"""
+        insert into `tabParts Consumption Daily`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             posting_date, repair_order, item_code, is_billable, qty, amount)
+        select {name}, %(now)s, %(now)s, %(user)s, %(user)s, 0, 0,
+            t.posting_date, t.repair_order, t.item_code, t.is_billable, t.qty, t.amount
+        from (
+            select se.posting_date, se.repair_order, sed.item_code,
+                sed.is_billable, sum(sed.qty) as qty, sum(sed.qty * sed.valuation_rate) as amount
+            from `tabStock Entry` se
+            join `tabStock Entry Detail` sed on sed.parent = se.name
+            where se.docstatus = 1 and ifnull(se.repair_order, '') != ''
+            group by se.posting_date, se.repair_order, sed.item_code, sed.is_billable
+        ) t
+        """,
+        {"now": now(), "user": frappe.session.user},
+    )
+    return frappe.db.count("Parts Consumption Daily")
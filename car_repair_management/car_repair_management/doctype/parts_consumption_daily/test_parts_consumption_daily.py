@@ -0,0 +1,52 @@
+# Copyright (c) 2025, Selfmade Cloud Solutions and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import today
+
+from car_repair_management.car_repair_management.doctype.parts_consumption_daily.parts_consumption_daily import (
+	stamp_billable_flags,
+	update_parts_consumption,
+)
+from car_repair_management.tests.test_repair_order import _ensure_stock_item, make_repair_order
+
+
+class TestPartsConsumptionDaily(FrappeTestCase):
+	def setUp(self):
+		self.item = _ensure_stock_item("Test Item A")
+		self.ro = make_repair_order()
+		self.ro.append("parts_plan", {"item_code": self.item, "uom": "Nos", "qty_planned": 2, "is_billable": 0, "is_foc": 1})
+		self.ro.save()
+
+	def stock_entry(self, docstatus=1):
+		return frappe._dict(
+			repair_order=self.ro.name,
+			posting_date=today(),
+			docstatus=docstatus,
+			items=[
+				frappe._dict(item_code=self.item, qty=2, valuation_rate=10),
+				frappe._dict(item_code=self.item, qty=1, valuation_rate=10),
+			],
+		)
+
+	def rollup(self):
+		return frappe.get_all(
+			"Parts Consumption Daily",
+			filters={"repair_order": self.ro.name},
+			fields=["item_code", "is_billable", "qty", "amount"],
+		)
+
+	def test_post_and_reverse_with_posted_flag(self):
+		entry = self.stock_entry()
+		stamp_billable_flags(entry)
+		update_parts_consumption(entry)
+		rows = self.rollup()
+		self.assertEqual(len(rows), 1)
+		self.assertEqual((rows[0].is_billable, rows[0].qty, rows[0].amount), (0, 3, 30))
+
+		# The plan flag changes after submit; the cancel still reverses the posted row
+		frappe.db.set_value("Repair Parts Plan", {"parent": self.ro.name}, {"is_billable": 1, "is_foc": 0})
+		entry.docstatus = 2
+		update_parts_consumption(entry)
+		self.assertEqual(self.rollup(), [])
@@ -0,0 +1,9 @@
+import frappe
+from frappe.model.document import Document
+
+
+class RepairCostLedgerEntry(Document):
+    def validate(self):
+        # Append-only: corrections are posted as reversing entries
+        if not self.is_new():
+            frappe.throw("Repair Cost Ledger Entry cannot be modified. Post a reversing entry instead.")
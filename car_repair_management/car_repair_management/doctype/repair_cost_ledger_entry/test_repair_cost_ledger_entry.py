@@ -0,0 +1,48 @@
+# Copyright (c) 2025, Selfmade Cloud Solutions and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from car_repair_management.car_repair_management.doctype.repair_order.cost_ledger import (
+	get_ledger_totals,
+	linked_voucher_amounts,
+	post_voucher,
+	rebuild_cost_ledger,
+)
+from car_repair_management.tests.test_repair_order import make_repair_order
+
+
+class TestRepairCostLedgerEntry(FrappeTestCase):
+	def setUp(self):
+		self.ro = make_repair_order()
+		# Any existing document can stand in for a source voucher
+		self.voucher = frappe._dict(doctype="Repair Order", name=self.ro.name, docstatus=1)
+
+	def test_post_and_reverse(self):
+		deltas = post_voucher(self.voucher, {(self.ro.name, "Labor"): 150, (self.ro.name, "Quoted"): 0})
+		self.assertEqual(deltas, {self.ro.name: {"Labor": 150}})
+		self.assertEqual(get_ledger_totals(self.ro.name), {"Labor": 150})
+
+		# A cancel reverses what was posted, whatever amounts are passed
+		self.voucher.docstatus = 2
+		self.assertEqual(post_voucher(self.voucher, {(self.ro.name, "Labor"): 999}), {self.ro.name: {"Labor": -150}})
+		self.assertEqual(get_ledger_totals(self.ro.name), {"Labor": 0})
+
+	def test_rebuild_keeps_only_source_documents(self):
+		post_voucher(self.voucher, {(self.ro.name, "Labor"): 80})
+		drift = rebuild_cost_ledger(self.ro.name, verify_only=True)
+		self.assertEqual([(d["cost_type"], d["ledger"], d["source"]) for d in drift], [("Labor", 80, 0)])
+
+		rebuild_cost_ledger(self.ro.name)
+		self.assertEqual(get_ledger_totals(self.ro.name), {})
+		self.assertEqual(frappe.db.get_value("Repair Order", self.ro.name, "labor_cost"), 0)
+
+	def test_only_linked_quotation_counts(self):
+		first = frappe._dict(doctype="Quotation", name="TEST-QTN-1", docstatus=1, grand_total=500)
+		revision = frappe._dict(doctype="Quotation", name="TEST-QTN-2", docstatus=1, grand_total=700)
+
+		# The first submitted quotation becomes the RO's link; a later one is not added on top
+		self.assertEqual(linked_voucher_amounts(first, self.ro.name), {(self.ro.name, "Quoted"): 500})
+		self.assertEqual(frappe.db.get_value("Repair Order", self.ro.name, "quotation"), "TEST-QTN-1")
+		self.assertEqual(linked_voucher_amounts(revision, self.ro.name), {})
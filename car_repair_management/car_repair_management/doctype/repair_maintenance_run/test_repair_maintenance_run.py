@@ -0,0 +1,89 @@
+# Copyright (c) 2025, Selfmade Cloud Solutions and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from car_repair_management.sharding import requeue_stale_shards, retry_failed_shards, run_shard, run_sharded
+from car_repair_management.tests.test_repair_order import make_repair_order
+
+METHOD = "car_repair_management.car_repair_management.doctype.repair_maintenance_run.test_repair_maintenance_run.record_chunk"
+ON_COMPLETE = METHOD.replace(".record_chunk", ".record_completion")
+PROCESSED = []
+COMPLETED = []
+
+
+def record_chunk(ro_names, fail=False):
+	if fail:
+		raise frappe.ValidationError("Shard failure")
+	PROCESSED.extend(ro_names)
+
+
+def record_completion(run_name):
+	COMPLETED.append(run_name)
+
+
+class TestRepairMaintenanceRun(FrappeTestCase):
+	def setUp(self):
+		PROCESSED.clear()
+		COMPLETED.clear()
+		self.names = [make_repair_order().name for _i in range(3)]
+
+	def tearDown(self):
+		# run_shard commits like the worker it is, so its runs and our ROs outlive the test transaction
+		for run_name in frappe.get_all("Repair Maintenance Run", filters={"method": METHOD}, pluck="name"):
+			frappe.delete_doc("Repair Maintenance Run", run_name, force=True, ignore_permissions=True)
+		frappe.db.delete("Job Costing", {"repair_order": ["in", self.names]})
+		for name in self.names:
+			frappe.delete_doc("Repair Order", name, force=True, ignore_permissions=True)
+		frappe.db.commit()
+
+	def run_all(self, run_name):
+		for shard in frappe.get_doc("Repair Maintenance Run", run_name).shards:
+			run_shard(run_name, shard.name)
+		return frappe.get_doc("Repair Maintenance Run", run_name)
+
+	def test_shards_cover_every_repair_order(self):
+		run_name = run_sharded(METHOD, shards=2, filters={"name": ["in", self.names]})
+		run = self.run_all(run_name)
+		self.assertEqual(run.total_shards, 2)
+		self.assertEqual(run.status, "Completed")
+		self.assertTrue(set(self.names) <= set(PROCESSED))
+
+	def test_on_complete_runs_once_after_the_last_shard(self):
+		run_name = run_sharded(METHOD, shards=2, filters={"name": ["in", self.names]}, on_complete=ON_COMPLETE)
+		shards = frappe.get_doc("Repair Maintenance Run", run_name).shards
+		run_shard(run_name, shards[0].name)
+		self.assertEqual(COMPLETED, [])
+
+		run_shard(run_name, shards[1].name)
+		run_shard(run_name, shards[1].name)
+		self.assertEqual(COMPLETED, [run_name])
+
+	def test_failed_shard_is_retried_then_failed(self):
+		run_name = run_sharded(METHOD, shards=1, max_attempts=2, filters={"name": ["in", self.names]}, fail=True)
+		run = self.run_all(run_name)
+		self.assertEqual((run.shards[0].status, run.shards[0].attempts), ("Queued", 1))
+
+		run = self.run_all(run_name)
+		self.assertEqual((run.shards[0].status, run.shards[0].attempts), ("Failed", 2))
+		self.assertEqual((run.status, run.failed_shards), ("Failed", 1))
+
+		self.assertEqual(retry_failed_shards(run_name), 1)
+		self.assertEqual(frappe.db.get_value("Repair Maintenance Run", run_name, "status"), "Running")
+
+	def test_stale_running_shard_is_retried(self):
+		run_name = run_sharded(METHOD, shards=1, max_attempts=2, filters={"name": ["in", self.names]})
+		shard = frappe.get_doc("Repair Maintenance Run", run_name).shards[0]
+		# A worker killed mid-shard leaves it Running with an old heartbeat
+		frappe.db.set_value("Repair Maintenance Shard", shard.name, {
+			"status": "Running", "attempts": 1, "heartbeat": add_to_date(now_datetime(), hours=-2),
+		})
+
+		requeue_stale_shards()
+		status, attempts, error = frappe.db.get_value(
+			"Repair Maintenance Shard", shard.name, ["status", "attempts", "error"]
+		)
+		self.assertEqual((status, attempts), ("Queued", 1))
+		self.assertIn("No heartbeat", error)
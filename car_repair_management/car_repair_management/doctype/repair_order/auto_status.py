@@ -1,74 +1,55 @@
-"""Auto-update RO status based on task and document states."""
+"""Auto-update RO status based on task and document states.
+
+Transitions go through the status machine: guards are checked in one query
+and the status is written directly, without loading or saving the RO.
+"""
 import frappe
 
+from car_repair_management.car_repair_management.doctype.repair_order.cost_ledger import voucher_repair_order
+from car_repair_management.car_repair_management.doctype.repair_order.status_machine import apply_transition
+from car_repair_management.car_repair_management.doctype.repair_order.task_routing import track_task_change
+
 
 def update_ro_status_from_task(task_doc, method=None):
-    """Auto-update RO status when tasks change."""
-    if not task_doc.repair_order:
+    """Auto-update RO status when a task's status changes."""
+    # Description edits and progress tweaks never move task counters or an RO
+    if not (task_doc.has_value_changed("status") or task_doc.has_value_changed("repair_order")):
         return
-    
-    ro = frappe.get_doc("Repair Order", task_doc.repair_order)
-    
-    # Skip if RO is in hold/cancelled/closed states
-    if ro.status in ("On Hold", "Delivered", "Closed", "Cancelled"):
+
+    # Counts the change on the RO(s); status and counters come from the routing cache
+    route = track_task_change(task_doc)
+    if not route or not task_doc.has_value_changed("status"):
         return
+    status, open_tasks, closed_tasks = route
     
     # Auto transition: Scheduled -> In Progress when any task starts
-    if task_doc.status in ("Working", "Open") and ro.status == "Scheduled":
-        ro.status = "In Progress"
-        ro.flags.ignore_validate_update_after_submit = True
-        ro.save(ignore_permissions=True)
-        frappe.msgprint(f"Repair Order {ro.name} status updated to In Progress", alert=True, indicator="blue")
+    if task_doc.status in ("Working", "Open") and status == "Scheduled":
+        _transition(task_doc.repair_order, "In Progress", "blue")
     
     # Auto transition: In Progress -> Completed when all tasks are closed
     elif task_doc.status == "Completed" or task_doc.status == "Closed":
-        check_and_complete_ro(ro)
+        check_and_complete_ro(task_doc.repair_order, status, open_tasks, closed_tasks)
 
 
-def check_and_complete_ro(ro):
-    """Check if all tasks are completed and transition RO to Completed."""
-    if ro.status != "In Progress":
-        return
-    
-    # Get all tasks for this RO
-    task_names = [op.task for op in (ro.operations or []) if op.task]
-    if not task_names:
+def check_and_complete_ro(ro_name, status, open_tasks, closed_tasks):
+    """Transition the RO to Completed once all of its tasks are closed, from its task counters."""
+    if status != "In Progress" or open_tasks or not closed_tasks:
         return
-    
-    # Check if all tasks are completed
-    open_tasks = frappe.db.count("Task", {
-        "name": ["in", task_names],
-        "status": ["not in", ["Completed", "Closed", "Cancelled"]]
-    })
-    
-    if open_tasks == 0:
-        ro.status = "Completed"
-        ro.flags.ignore_validate_update_after_submit = True
-        ro.save(ignore_permissions=True)
-        frappe.msgprint(f"Repair Order {ro.name} status updated to Completed", alert=True, indicator="green")
+    _transition(ro_name, "Completed", "green")
 
 
 def update_ro_status_from_sales_invoice(si_doc, method=None):
     """Auto-update RO status when Sales Invoice is submitted."""
-    ro_name = si_doc.custom_repair_order if hasattr(si_doc, 'custom_repair_order') else None
-    if not ro_name:
-        for item in (si_doc.items or []):
-            if hasattr(item, 'repair_order') and item.repair_order:
-                ro_name = item.repair_order
-                break
-    
+    ro_name = voucher_repair_order(si_doc)
     if not ro_name:
         return
     
-    ro = frappe.get_doc("Repair Order", ro_name)
-    
-    # Skip if already in final states
-    if ro.status in ("Delivered", "Closed", "Cancelled"):
-        return
-    
     # Auto transition: Completed -> Invoiced when SI is submitted
-    if si_doc.docstatus == 1 and ro.status == "Completed":
-        ro.status = "Invoiced"
-        ro.flags.ignore_validate_update_after_submit = True
-        ro.save(ignore_permissions=True)
-        frappe.msgprint(f"Repair Order {ro.name} status updated to Invoiced", alert=True, indicator="green")
+    if si_doc.docstatus == 1 and frappe.db.get_value("Repair Order", ro_name, "status") == "Completed":
+        _transition(ro_name, "Invoiced", "green")
+
+
+def _transition(ro_name, status, indicator):
+    # Automatic transitions that are not allowed yet (e.g. open tasks) are skipped, not raised
+    if apply_transition(ro_name, status, throw=False):
+        frappe.msgprint(f"Repair Order {ro_name} status updated to {status}", alert=True, indicator=indicator)
@@ -0,0 +1,277 @@
+"""Append-only cost ledger for Repair Orders.
+
+Source documents (Timesheet, Purchase Invoice, Quotation, Sales Invoice) post
+signed deltas on submit and reverse them on cancel, so RO totals are read from
+a handful of ledger rows instead of being re-aggregated from the whole
+transaction history.
+"""
+import frappe
+from frappe.utils import flt, now
+
+from car_repair_management.vehicle_rollups import recompute_vehicle_rollups
+
+LEDGER_DOCTYPE = "Repair Cost Ledger Entry"
+
+# Ledger cost type -> Repair Order field it feeds
+COST_FIELDS = {
+    "Labor": "labor_cost",
+    "Other Charges": "other_charges",
+    "Quoted": "quoted_amount",
+    "Invoiced": "invoiced_amount",
+}
+
+# Voucher doctype -> (cost type, Repair Order field linking the one voucher that counts)
+LINKED_VOUCHERS = {
+    "Quotation": ("Quoted", "quotation"),
+    "Sales Invoice": ("Invoiced", "sales_invoice"),
+}
+
+# Also explained by query_plans
+TOTALS_QUERY = """
+    select cost_type, sum(amount)
+    from `tabRepair Cost Ledger Entry`
+    where repair_order = %s
+    group by cost_type
+"""
+REVERSAL_QUERY = """
+    select repair_order, cost_type, sum(amount)
+    from `tabRepair Cost Ledger Entry`
+    where voucher_type = %s and voucher_no = %s
+    group by repair_order, cost_type
+"""
+
+
+def get_ledger_totals(repair_order):
+    """Return {cost_type: total} for one Repair Order."""
+    rows = frappe.db.sql(TOTALS_QUERY, repair_order)
+    return {cost_type: flt(total) for cost_type, total in rows}
+
+
+def post_voucher(voucher, amounts=None):
+    """Post ledger entries for a voucher and return {repair_order: {cost_type: delta}}.
+
+    On submit `amounts` is {(repair_order, cost_type): amount}. On cancel the
+    entries previously posted for the voucher are reversed, whatever their source.
+    """
+    if voucher.docstatus == 2:
+        amounts = _reversal_amounts(voucher.doctype, voucher.name)
+
+    deltas = {}
+    for (ro_name, cost_type), amount in (amounts or {}).items():
+        amount = flt(amount)
+        if not ro_name or not amount:
+            continue
+        frappe.get_doc({
+            "doctype": LEDGER_DOCTYPE,
+            "repair_order": ro_name,
+            "cost_type": cost_type,
+            "amount": amount,
+            "voucher_type": voucher.doctype,
+            "voucher_no": voucher.name,
+        }).insert(ignore_permissions=True)
+        deltas.setdefault(ro_name, {})[cost_type] = amount
+    return deltas
+
+
+def voucher_repair_order(voucher):
+    """RO of a Quotation, Sales Order or Sales Invoice: its own link, else the first item row carrying one."""
+    if voucher.get("custom_repair_order"):
+        return voucher.custom_repair_order
+    return next((d.repair_order for d in voucher.get("items") or [] if d.get("repair_order")), None)
+
+
+def linked_voucher_amounts(voucher, ro_name):
+    """{(ro_name, cost_type): grand_total} if `voucher` is the Quotation / Sales Invoice `ro_name` links.
+
+    The first voucher submitted for an RO becomes its link (`quotation` /
+    `sales_invoice`), so later revisions are not added on top of it. Changing
+    the link by hand is picked up by `rebuild_cost_ledger`.
+    """
+    cost_type, link_field = LINKED_VOUCHERS[voucher.doctype]
+    if voucher.docstatus == 1:
+        linked = frappe.db.get_value("Repair Order", ro_name, link_field)
+        if not linked:
+            frappe.db.set_value("Repair Order", ro_name, link_field, voucher.name)
+        elif linked != voucher.name:
+            return {}
+    return {(ro_name, cost_type): voucher.grand_total}
+
+
+def _reversal_amounts(voucher_type, voucher_no):
+    rows = frappe.db.sql(REVERSAL_QUERY, (voucher_type, voucher_no))
+    return {(ro_name, cost_type): -flt(total) for ro_name, cost_type, total in rows}
+
+
+def timesheet_labor_by_repair_order(timesheet_doc):
+    """Return {(repair_order, "Labor"): amount} for a Timesheet.
+
+    Each time log is attributed to exactly one RO: the Timesheet's own link,
+    else the RO of its Task, else the RO of its Project.
+    """
+    logs = timesheet_doc.time_logs or []
+    ts_ro = getattr(timesheet_doc, "repair_order", None)
+    task_ro, project_ro = {}, {}
+    if not ts_ro:
+        task_ro = _repair_order_map("Task", [d.task for d in logs if d.task])
+        project_ro = _repair_order_map("Project", [d.project for d in logs if getattr(d, "project", None)])
+
+    amounts = {}
+    for d in logs:
+        ro_name = ts_ro or task_ro.get(d.task) or project_ro.get(getattr(d, "project", None))
+        if ro_name:
+            key = (ro_name, "Labor")
+            amounts[key] = amounts.get(key, 0) + flt(d.hours) * flt(d.billing_rate)
+    return amounts
+
+
+def _repair_order_map(doctype, names):
+    if not names:
+        return {}
+    return dict(
+        frappe.get_all(
+            doctype,
+            filters={"name": ["in", list(set(names))], "repair_order": ["is", "set"]},
+            fields=["name", "repair_order"],
+            as_list=True,
+        )
+    )
+
+
+def rebuild_cost_ledger(repair_order=None, verify_only=False):
+    """Reconstruct the cost ledger from submitted source documents.
+
+    With `verify_only` the ledger is left untouched and the (repair_order,
+    cost_type) pairs whose ledger total differs from the sources are returned.
+
+    bench --site <site> execute car_repair_management.car_repair_management.doctype.repair_order.cost_ledger.rebuild_cost_ledger
+    """
+    entries = _entries_from_sources(repair_order)
+
+    if verify_only:
+        expected = {}
+        for e in entries:
+            key = (e["repair_order"], e["cost_type"])
+            expected[key] = expected.get(key, 0) + flt(e["amount"])
+        conditions, params = "", []
+        if repair_order:
+            conditions, params = "where repair_order = %s", [repair_order]
+        actual = {
+            (ro_name, cost_type): flt(total)
+            for ro_name, cost_type, total in frappe.db.sql(
+                f"""
+                select repair_order, cost_type, sum(amount)
+                from `tabRepair Cost Ledger Entry`
+                {conditions}
+                group by repair_order, cost_type
+                """,
+                params,
+            )
+        }
+        return [
+            {"repair_order": key[0], "cost_type": key[1], "ledger": actual.get(key, 0), "source": expected.get(key, 0)}
+            for key in sorted(set(expected) | set(actual))
+            if abs(actual.get(key, 0) - expected.get(key, 0)) > 0.005
+        ]
+
+    frappe.db.delete(LEDGER_DOCTYPE, {"repair_order": repair_order} if repair_order else None)
+    timestamp, user = now(), frappe.session.user
+    values = [
+        (frappe.generate_hash(length=10), timestamp, timestamp, user, user,
+         e["repair_order"], e["cost_type"], flt(e["amount"]), e["voucher_type"], e["voucher_no"])
+        for e in entries
+        if flt(e["amount"])
+    ]
+    frappe.db.bulk_insert(
+        LEDGER_DOCTYPE,
+        fields=["name", "creation", "modified", "owner", "modified_by",
+                "repair_order", "cost_type", "amount", "voucher_type", "voucher_no"],
+        values=values,
+    )
+    _refresh_totals_from_ledger(repair_order)
+    # Delivered ROs' new totals feed the Vehicle repair cost rollup
+    vehicle = frappe.db.get_value("Repair Order", repair_order, "vehicle") if repair_order else None
+    if vehicle or not repair_order:
+        recompute_vehicle_rollups([vehicle] if vehicle else None)
+    return len(values)
+
+
+def _entries_from_sources(repair_order=None):
+    ro_filter = "= %(ro)s" if repair_order else "is not null"
+    params = {"ro": repair_order}
+    entries = []
+
+    # Labor: one RO per time log, same precedence as timesheet_labor_by_repair_order
+    entries += frappe.db.sql(
+        f"""
+        select coalesce(nullif(ts.repair_order, ''), nullif(t.repair_order, ''), nullif(p.repair_order, '')) as repair_order,
+            'Labor' as cost_type, 'Timesheet' as voucher_type, ts.name as voucher_no,
+            sum(tl.hours * tl.billing_rate) as amount
+        from `tabTimesheet` ts
+        join `tabTimesheet Detail` tl on tl.parent = ts.name
+        left join `tabTask` t on t.name = tl.task
+        left join `tabProject` p on p.name = tl.project
+        where ts.docstatus = 1
+        group by 1, ts.name
+        having repair_order {ro_filter}
+        """,
+        params,
+        as_dict=True,
+    )
+    entries += frappe.db.sql(
+        f"""
+        select repair_order, 'Other Charges' as cost_type, 'Purchase Invoice' as voucher_type,
+            name as voucher_no, grand_total as amount
+        from `tabPurchase Invoice`
+        where docstatus = 1 and nullif(repair_order, '') {ro_filter}
+        """,
+        params,
+        as_dict=True,
+    )
+    for doctype, (cost_type, link_field) in LINKED_VOUCHERS.items():
+        # Only the voucher the RO links counts, as in post_linked_voucher
+        entries += frappe.db.sql(
+            f"""
+            select ro.name as repair_order, '{cost_type}' as cost_type, '{doctype}' as voucher_type,
+                d.name as voucher_no, d.grand_total as amount
+            from `tabRepair Order` ro
+            join `tab{doctype}` d on d.name = ro.{link_field}
+            where d.docstatus = 1 and ro.name {ro_filter}
+            """,
+            params,
+            as_dict=True,
+        )
+    return entries
+
+
+def _refresh_totals_from_ledger(repair_order=None):
+    """Set RO cost fields from ledger sums (set-based, used after a rebuild)."""
+    conditions, params = "", {}
+    if repair_order:
+        conditions, params = "where ro.name = %(ro)s", {"ro": repair_order}
+    # other_charges is only taken from the ledger when Purchase Invoices exist,
+    # so a manually entered value on an RO without PIs is preserved
+    frappe.db.sql(
+        f"""
+        update `tabRepair Order` ro
+        left join (
+            select repair_order,
+                sum(case when cost_type = 'Labor' then amount else 0 end) as labor,
+                sum(case when cost_type = 'Other Charges' then amount else 0 end) as other,
+                max(case when cost_type = 'Other Charges' then 1 else 0 end) as has_other,
+                sum(case when cost_type = 'Quoted' then amount else 0 end) as quoted,
+                sum(case when cost_type = 'Invoiced' then amount else 0 end) as invoiced
+            from `tabRepair Cost Ledger Entry`
+            group by repair_order
+        ) l on l.repair_order = ro.name
+        set ro.total_job_cost = ifnull(ro.parts_cost, 0) + ifnull(l.labor, 0)
+                + if(l.has_other = 1, l.other, ifnull(ro.other_charges, 0)),
+            ro.gross_margin = ifnull(l.invoiced, 0) - (ifnull(ro.parts_cost, 0) + ifnull(l.labor, 0)
+                + if(l.has_other = 1, l.other, ifnull(ro.other_charges, 0))),
+            ro.labor_cost = ifnull(l.labor, 0),
+            ro.other_charges = if(l.has_other = 1, l.other, ifnull(ro.other_charges, 0)),
+            ro.quoted_amount = ifnull(l.quoted, 0),
+            ro.invoiced_amount = ifnull(l.invoiced, 0)
+        {conditions}
+        """,
+        params,
+    )
@@ -0,0 +1,94 @@
+"""Coalesced background recompute of Repair Order costs.
+
+Cost hooks only post ledger entries inside the submitting user's transaction
+and, once it commits, mark the RO as pending in a Redis sorted set scored by
+the time of its latest event. `sweep_pending_recomputes` runs every minute
+from the scheduler and recomputes each RO that has been quiet for one
+debounce window. The default window is one sweep interval, so a burst is
+recomputed by the first or second sweep after it ends; under a steady stream
+of events an RO waits at most MAX_DEBOUNCE_WINDOWS windows (about three
+sweeps). No worker ever sleeps waiting for a burst to settle. Windows shorter
+than a minute only make the quiet check looser; the sweep cadence is the
+floor on latency.
+
+An RO is claimed by atomically removing its mark, and only if it is still
+due, before it is recomputed: an event arriving meanwhile marks it again and
+is picked up by a later sweep.
+"""
+import time
+
+import frappe
+
+PENDING_KEY = "car_repair_ro_recompute_pending"
+FIRST_PENDING_KEY = "car_repair_ro_recompute_first_pending"
+# One interval of the per-minute sweep cron
+DEFAULT_DEBOUNCE_SECONDS = 60
+# A steady stream of events may postpone a recompute at most this many windows
+MAX_DEBOUNCE_WINDOWS = 3
+
+# Remove the RO's marks if it is quiet since ARGV[2] or pending since ARGV[3]; 1 when claimed
+CLAIM_SCRIPT = """
+local last = redis.call('zscore', KEYS[1], ARGV[1])
+if not last then return 0 end
+local first = redis.call('zscore', KEYS[2], ARGV[1])
+if tonumber(last) > tonumber(ARGV[2]) and (not first or tonumber(first) > tonumber(ARGV[3])) then
+    return 0
+end
+redis.call('zrem', KEYS[1], ARGV[1])
+redis.call('zrem', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+def queue_recompute(ro_name):
+    """Schedule a recompute of `ro_name`; runs inline when sync mode is on.
+
+    Sync mode is forced by `frappe.flags.sync_ro_recompute` (or when running
+    tests) so callers can assert on RO totals right after a submit.
+    """
+    if frappe.flags.sync_ro_recompute or frappe.flags.in_test:
+        recompute_repair_order(ro_name)
+        return
+
+    # Marked after commit, so a sweep never recomputes before the ledger entries are visible
+    frappe.db.after_commit.add(lambda: mark_pending(ro_name))
+
+
+def mark_pending(ro_name, at=None):
+    at = at or time.time()
+    frappe.cache.zadd(_key(PENDING_KEY), {ro_name: at})
+    frappe.cache.zadd(_key(FIRST_PENDING_KEY), {ro_name: at}, nx=True)
+
+
+def sweep_pending_recomputes():
+    """Scheduler entry point: recompute every pending RO whose debounce window has passed."""
+    window = frappe.conf.get("ro_recompute_debounce_seconds") or DEFAULT_DEBOUNCE_SECONDS
+    now = time.time()
+    quiet_since, pending_since = now - window, now - window * MAX_DEBOUNCE_WINDOWS
+    candidates = set(frappe.cache.zrangebyscore(_key(PENDING_KEY), "-inf", quiet_since))
+    candidates |= set(frappe.cache.zrangebyscore(_key(FIRST_PENDING_KEY), "-inf", pending_since))
+
+    claim = frappe.cache.register_script(CLAIM_SCRIPT)
+    for ro_name in sorted(frappe.safe_decode(name) for name in candidates):
+        if not claim(keys=[_key(PENDING_KEY), _key(FIRST_PENDING_KEY)], args=[ro_name, quiet_since, pending_since]):
+            continue
+        try:
+            recompute_repair_order(ro_name)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            # Retried by the next sweep
+            mark_pending(ro_name, at=now)
+            frappe.log_error(title=f"Repair Order cost recompute failed: {ro_name}")
+
+
+def recompute_repair_order(ro_name):
+    """Recompute cost fields of one RO from the cost ledger and persist the changes."""
+    from car_repair_management.car_repair_management.doctype.repair_order.repair_order import persist_costs
+
+    return persist_costs(ro_name)
+
+
+def _key(key):
+    # Sorted sets are not wrapped by frappe.cache, so keys get the site prefix here
+    return frappe.cache.make_key(key)
@@ -1,21 +1,77 @@
 import frappe
 from frappe.model.document import Document
-from frappe.utils import now_datetime
+from frappe.utils import flt, now_datetime
+
+from car_repair_management.car_repair_management.doctype.job_costing_history.job_costing_history import (
+    record_cost_history,
+)
+from car_repair_management.car_repair_management.doctype.repair_order.cost_ledger import (
+    COST_FIELDS as LEDGER_COST_FIELDS,
+    get_ledger_totals,
+    linked_voucher_amounts,
+    post_voucher,
+    timesheet_labor_by_repair_order,
+    voucher_repair_order,
+)
+from car_repair_management.car_repair_management.doctype.repair_order.recompute_queue import queue_recompute
+from car_repair_management.car_repair_management.doctype.repair_order.repeat_repairs import clear_vehicle_cache
+from car_repair_management.car_repair_management.doctype.repair_order.status_machine import (
+    apply_transition,
+    check_transition,
+)
+from car_repair_management.repair_status import clear_repair_status_cache
+from car_repair_management.report_cache import invalidate_reports_reading
+from car_repair_management.vehicle_rollups import on_delivered_cost_change, on_repair_order_delivered
 
 
 class RepairOrder(Document):
     pass
 
 
+def _get_item_details(item_codes):
+    """Return {item_code: {valuation_rate, item_name, stock_uom}} for all given items in one query."""
+    item_codes = list({code for code in item_codes if code})
+    if not item_codes:
+        return {}
+    items = frappe.get_all(
+        "Item",
+        filters={"name": ["in", item_codes]},
+        fields=["name", "valuation_rate", "item_name", "stock_uom"],
+    )
+    return {d.name: d for d in items}
+
+
+def _get_parts_item_details(doc):
+    """Item details for the parts plan of `doc`, memoized on the doc for the current save."""
+    item_codes = frozenset(d.item_code for d in (doc.parts_plan or []) if d.item_code)
+    cached = doc.flags.parts_item_details
+    if cached is None or cached[0] != item_codes:
+        cached = (item_codes, _get_item_details(item_codes))
+        doc.flags.parts_item_details = cached
+    return cached[1]
+
+
 def _mutual_exclusion_parts(doc):
+    items = _get_parts_item_details(doc)
     for d in doc.parts_plan or []:
         if d.is_billable and d.is_foc:
             frappe.throw("Parts Plan row cannot be both Billable and FoC")
         if d.item_code and not d.item_name:
-            d.item_name = frappe.db.get_value("Item", d.item_code, "item_name")
+            d.item_name = (items.get(d.item_code) or {}).get("item_name")
+
+
+def _refresh_task_counters(doc):
+    # Task counters move by atomic updates from Task events; never write back a stale copy
+    if not doc.is_new():
+        doc.open_tasks, doc.closed_tasks = frappe.db.get_value(
+            "Repair Order", doc.name, ["open_tasks", "closed_tasks"], for_update=True
+        )
 
 
 def on_validate(doc, method=None):
+    _refresh_task_counters(doc)
+    # Fresh item lookup per save; before_save reuses it for costing
+    doc.flags.parts_item_details = None
     _mutual_exclusion_parts(doc)
     # Basic SLA validations
     if doc.sla_delivery_by and doc.sla_response_by and doc.sla_delivery_by < doc.sla_response_by:
@@ -44,6 +100,13 @@ def on_submit(doc, method=None):
     if not doc.project:
         _create_project_and_tasks(doc)
 
+    # A new RO may be a return for this vehicle
+    clear_vehicle_cache(doc.vehicle)
+
+
+def on_cancel(doc, method=None):
+    clear_vehicle_cache(doc.vehicle)
+
 
 def _create_project_and_tasks(doc):
     """Create project and tasks for a submitted RO."""
@@ -80,29 +143,28 @@ def _create_project_and_tasks(doc):
 
 
 def before_update_after_submit(doc, method=None):
+    _refresh_task_counters(doc)
+
     # Recompute costs on status changes
+    doc.flags.parts_item_details = None
     _recompute_costs(doc)
     
-    # Guard: Ready for Handover requires all QC tasks completed
-    if doc.status == "Ready for Handover":
-        qc_incomplete = []
-        for op in doc.operations or []:
-            if op.is_qc and op.task:
-                status = frappe.db.get_value("Task", op.task, "status")
-                if status != "Closed":
-                    qc_incomplete.append(op.operation_name or op.task)
-        if qc_incomplete:
-            frappe.throw("Cannot set Ready for Handover. QC tasks incomplete: " + ", ".join(qc_incomplete))
-
-    # Guard: Close requires Sales Invoices fully paid
-    if doc.status in ("Closed",):
-        if doc.sales_invoice:
-            status = frappe.db.get_value("Sales Invoice", doc.sales_invoice, "status")
-            if status not in ("Paid", "Submitted"):
-                frappe.throw("Cannot Close. Linked Sales Invoice not fully paid.")
-    
-    # Snapshot to Job Costing on status transitions
-    _update_job_costing_snapshot(doc)
+    # Status changes follow the transition table and its guards (QC closed, invoice paid, ...)
+    before = doc.get_doc_before_save()
+    if before and before.status != doc.status:
+        check_transition(doc, before.status, doc.status)
+
+    # Returns are measured from the delivery of the previous RO
+    if doc.status == "Delivered" and not doc.delivered_on:
+        doc.delivered_on = now_datetime()
+        clear_vehicle_cache(doc.vehicle)
+        on_repair_order_delivered(doc)
+    elif before and before.delivered_on:
+        on_delivered_cost_change(doc, before.total_job_cost)
+
+    # Snapshot to Job Costing only when a cost actually changed
+    if before is None or _changed_costs(before.as_dict(), {f: doc.get(f) for f in COST_FIELDS}):
+        _update_job_costing_snapshot(doc)
 
 
 @frappe.whitelist()
@@ -126,6 +188,7 @@ def make_quotation_from_repair_order(name: str):
             "vehicle": doc.vehicle,
         })
     # Add billable parts
+    items = _get_parts_item_details(doc)
     for part in doc.parts_plan or []:
         if part.is_billable:
             quotation.append("items", {
@@ -133,7 +196,7 @@ def make_quotation_from_repair_order(name: str):
                 "item_name": part.item_name,
                 "description": part.item_name,
                 "qty": part.qty_planned or 0,
-                "uom": part.uom or frappe.db.get_value("Item", part.item_code, "stock_uom"),
+                "uom": part.uom or (items.get(part.item_code) or {}).get("stock_uom"),
                 "repair_order": doc.name,
                 "vehicle": doc.vehicle,
             })
@@ -157,13 +220,14 @@ def make_material_request_from_repair_order(name: str):
             wh = None
     if not wh:
         wh = frappe.db.get_value("Warehouse", {"is_group": 0, "company": mr.company})
+    items = _get_parts_item_details(doc)
     for part in doc.parts_plan or []:
         if part.is_billable:
             mr.append("items", {
                 "item_code": part.item_code,
                 "qty": part.qty_planned or 0,
                 "schedule_date": now_datetime(),
-                "uom": part.uom or frappe.db.get_value("Item", part.item_code, "stock_uom"),
+                "uom": part.uom or (items.get(part.item_code) or {}).get("stock_uom"),
                 "warehouse": wh,
             })
     mr.flags.ignore_permissions = True
@@ -184,10 +248,11 @@ def _apply_service_template(doc):
         })
     if not doc.parts_plan:
         doc.set("parts_plan", [])
+    items = _get_item_details(d.item_code for d in template.default_parts or [] if not d.item_name)
     for d in template.default_parts or []:
         doc.append("parts_plan", {
             "item_code": d.item_code,
-            "item_name": d.item_name or frappe.db.get_value("Item", d.item_code, "item_name"),
+            "item_name": d.item_name or (items.get(d.item_code) or {}).get("item_name"),
             "uom": d.uom,
             "qty_planned": d.qty_planned,
             "is_billable": d.is_billable,
@@ -263,187 +328,121 @@ def make_sales_invoice_from_sales_order(sales_order_name: str):
     return si
 
 
-def _recompute_costs(doc):
-    """Compute parts_cost, labor_cost, other_charges, total_job_cost, quoted_amount, invoiced_amount, gross_margin."""
+# Currency fields owned by the cost computation
+COST_FIELDS = (
+    "parts_cost",
+    "labor_cost",
+    "other_charges",
+    "total_job_cost",
+    "quoted_amount",
+    "invoiced_amount",
+    "gross_margin",
+)
+
+
+def _compute_costs(doc):
+    """Return {field: value} for parts_cost, labor_cost, other_charges, total_job_cost, quoted_amount, invoiced_amount, gross_margin."""
     # Parts cost from planned parts (valuation rate)
     parts_cost = 0
+    items = _get_parts_item_details(doc)
     for d in doc.parts_plan or []:
-        rate = frappe.db.get_value("Item", d.item_code, "valuation_rate") if d.item_code else 0
+        rate = (items.get(d.item_code) or {}).get("valuation_rate") if d.item_code else 0
         try:
             rate = float(rate or 0)
         except Exception:
             rate = 0
         parts_cost += (float(d.qty_planned or 0) * rate)
-    
-    # Labor cost from actual timesheets linked to this RO or its project/tasks
-    labor_cost = 0.0
-    if doc.name:
-        # Direct RO link
-        ts_hours = frappe.db.sql(
-            """
-            select sum(tl.hours * tl.billing_rate) as cost
-            from `tabTimesheet` ts
-            join `tabTimesheet Detail` tl on tl.parent = ts.name
-            where ts.docstatus = 1 and ts.repair_order = %s
-            """,
-            doc.name
-        )
-        if ts_hours and ts_hours[0][0]:
-            labor_cost += float(ts_hours[0][0])
-        
-        # Via project link (project is in Timesheet Detail, not Timesheet parent)
-        if doc.project:
-            ts_proj = frappe.db.sql(
-                """
-                select sum(tl.hours * tl.billing_rate) as cost
-                from `tabTimesheet` ts
-                join `tabTimesheet Detail` tl on tl.parent = ts.name
-                where ts.docstatus = 1 and tl.project = %s
-                """,
-                doc.project
-            )
-            if ts_proj and ts_proj[0][0]:
-                labor_cost += float(ts_proj[0][0])
-        
-        # Via tasks (find tasks linked to RO)
-        task_names = [op.task for op in (doc.operations or []) if op.task]
-        if task_names:
-            placeholders = ','.join(['%s'] * len(task_names))
-            ts_task = frappe.db.sql(
-                f"""
-                select sum(tl.hours * tl.billing_rate) as cost
-                from `tabTimesheet` ts
-                join `tabTimesheet Detail` tl on tl.parent = ts.name
-                where ts.docstatus = 1 and tl.task in ({placeholders})
-                """,
-                tuple(task_names)
-            )
-            if ts_task and ts_task[0][0]:
-                labor_cost += float(ts_task[0][0])
-    
-    # Other charges from Purchase Invoices linked to RO
-    other_charges_auto = 0.0
-    if doc.name:
-        pi_total = frappe.db.sql(
-            """
-            select sum(grand_total) as total
-            from `tabPurchase Invoice`
-            where docstatus = 1 and repair_order = %s
-            """,
-            doc.name
-        )
-        if pi_total and pi_total[0][0]:
-            other_charges_auto = float(pi_total[0][0])
-    
-    # If other_charges manually set, keep it; else use auto
-    if not doc.other_charges:
-        doc.other_charges = other_charges_auto
-    
-    doc.parts_cost = parts_cost
-    doc.labor_cost = labor_cost
-    doc.total_job_cost = (doc.parts_cost or 0) + (doc.labor_cost or 0) + (doc.other_charges or 0)
-    
-    # Quoted amount from linked quotation or any quotation with this RO
-    quoted = 0.0
-    if doc.quotation:
-        q_total = frappe.db.get_value("Quotation", doc.quotation, "grand_total")
-        quoted = float(q_total or 0)
-    elif doc.name:
-        # Find quotations linked via parent field
-        q_totals = frappe.db.sql(
-            """
-            select sum(grand_total) as total
-            from `tabQuotation`
-            where docstatus = 1 and custom_repair_order = %s
-            """,
-            doc.name
-        )
-        if q_totals and q_totals[0][0]:
-            quoted = float(q_totals[0][0])
-    doc.quoted_amount = quoted
-    
-    # Invoiced amount from linked sales invoice or any SI with this RO
-    invoiced = 0.0
-    if doc.sales_invoice:
-        si_total = frappe.db.get_value("Sales Invoice", doc.sales_invoice, "grand_total")
-        invoiced = float(si_total or 0)
-    elif doc.name:
-        # Find sales invoices linked via parent field
-        si_totals = frappe.db.sql(
-            """
-            select sum(grand_total) as total
-            from `tabSales Invoice`
-            where docstatus = 1 and custom_repair_order = %s
-            """,
-            doc.name
-        )
-        if si_totals and si_totals[0][0]:
-            invoiced = float(si_totals[0][0])
-    doc.invoiced_amount = invoiced
-    
+
+    # Labor, purchase, quoted and invoiced totals are kept in the cost ledger
+    totals = get_ledger_totals(doc.name) if doc.name else {}
+    costs = {field: totals.get(cost_type, 0.0) for cost_type, field in LEDGER_COST_FIELDS.items()}
+    costs["parts_cost"] = parts_cost
+
+    # Manually entered other_charges are kept until Purchase Invoices post to the ledger
+    if "Other Charges" not in totals:
+        costs["other_charges"] = doc.other_charges or 0
+
+    costs["total_job_cost"] = costs["parts_cost"] + costs["labor_cost"] + (costs["other_charges"] or 0)
     # Gross margin
-    doc.gross_margin = (doc.invoiced_amount or 0) - (doc.total_job_cost or 0)
+    costs["gross_margin"] = costs["invoiced_amount"] - costs["total_job_cost"]
+    return costs
+
+
+def _recompute_costs(doc):
+    """Compute cost fields onto `doc`."""
+    doc.update(_compute_costs(doc))
+
+
+def _changed_costs(stored, costs):
+    """Subset of `costs` that differs from `stored` at currency precision."""
+    return {
+        field: value
+        for field, value in costs.items()
+        if flt(value, 2) != flt(stored.get(field), 2)
+    }
+
+
+def persist_costs(ro_name):
+    """Recompute one RO's costs and write back only the fields that changed.
+
+    Loads just the cost fields and parts plan rows, never the full document.
+    When nothing changed there is no write, Job Costing update or version log;
+    otherwise the changed columns are updated directly (no document save).
+    """
+    ro = frappe.db.get_value(
+        "Repair Order", ro_name, ["name", "project", "vehicle", "docstatus", "delivered_on", *COST_FIELDS], as_dict=True
+    )
+    if not ro:
+        return {}
+    ro.flags = frappe._dict()
+    ro.parts_plan = frappe.get_all(
+        "Repair Parts Plan",
+        filters={"parent": ro_name, "parenttype": "Repair Order", "parentfield": "parts_plan"},
+        fields=["item_code", "qty_planned"],
+    )
+    changed = _changed_costs(ro, _compute_costs(ro))
+    if changed:
+        old_cost = ro.total_job_cost
+        frappe.db.set_value("Repair Order", ro_name, changed)
+        ro.update(changed)
+        on_delivered_cost_change(ro, old_cost)
+        _update_job_costing_snapshot(ro)
+        record_cost_history([ro_name])
+        # Direct writes skip the Repair Order doc events that invalidate cached reports and pages
+        invalidate_reports_reading("Repair Order", changed)
+        clear_repair_status_cache(ro_name)
+    return changed
+
+
+def _post_costs(voucher, amounts=None):
+    """Post a voucher to the cost ledger and queue a recompute of the affected ROs."""
+    for ro_name in post_voucher(voucher, amounts):
+        queue_recompute(ro_name)
 
 
 def update_ro_from_timesheet(timesheet_doc, method=None):
     """Update RO labor cost when timesheet is submitted/cancelled."""
-    ro_name = getattr(timesheet_doc, 'repair_order', None)
-    if not ro_name:
-        # Try via task in time_logs (project is in Timesheet Detail, not parent)
-        for d in (timesheet_doc.time_logs or []):
-            if d.task:
-                ro_name = frappe.db.get_value("Task", d.task, "repair_order")
-                if ro_name:
-                    break
-            # Try via project in time_logs
-            if not ro_name and hasattr(d, 'project') and d.project:
-                ro_name = frappe.db.get_value("Project", d.project, "repair_order")
-                if ro_name:
-                    break
-    if ro_name:
-        ro = frappe.get_doc("Repair Order", ro_name)
-        _recompute_costs(ro)
-        ro.flags.ignore_validate_update_after_submit = True
-        ro.save(ignore_permissions=True)
+    amounts = timesheet_labor_by_repair_order(timesheet_doc) if timesheet_doc.docstatus == 1 else None
+    _post_costs(timesheet_doc, amounts)
 
 
 def update_ro_from_purchase_invoice(pi_doc, method=None):
     """Update RO other_charges when PI is submitted/cancelled."""
     if pi_doc.repair_order:
-        ro = frappe.get_doc("Repair Order", pi_doc.repair_order)
-        _recompute_costs(ro)
-        ro.flags.ignore_validate_update_after_submit = True
-        ro.save(ignore_permissions=True)
+        _post_costs(pi_doc, {(pi_doc.repair_order, "Other Charges"): pi_doc.grand_total})
 
 
 def update_ro_from_quotation(quotation_doc, method=None):
     """Update RO quoted_amount and quotation field when Quotation is submitted/cancelled."""
-    # Find RO via parent field or quotation items
-    ro_name = quotation_doc.custom_repair_order if hasattr(quotation_doc, 'custom_repair_order') else None
-    if not ro_name:
-        for item in (quotation_doc.items or []):
-            if hasattr(item, 'repair_order') and item.repair_order:
-                ro_name = item.repair_order
-                break
+    ro_name = voucher_repair_order(quotation_doc)
     if ro_name:
-        ro = frappe.get_doc("Repair Order", ro_name)
-        # Update quotation field if not already set (for first quotation only)
-        if not ro.quotation and quotation_doc.docstatus == 1:
-            ro.quotation = quotation_doc.name
-        _recompute_costs(ro)
-        ro.flags.ignore_validate_update_after_submit = True
-        ro.save(ignore_permissions=True)
+        # On cancel the entries posted on submit (if any) are reversed
+        _post_costs(quotation_doc, linked_voucher_amounts(quotation_doc, ro_name))
 
 
 def update_ro_from_sales_order(so_doc, method=None):
     """Update RO sales_order field when SO is submitted."""
-    # Find RO via parent field or sales order items
-    ro_name = so_doc.custom_repair_order if hasattr(so_doc, 'custom_repair_order') else None
-    if not ro_name:
-        for item in (so_doc.items or []):
-            if hasattr(item, 'repair_order') and item.repair_order:
-                ro_name = item.repair_order
-                break
+    ro_name = voucher_repair_order(so_doc)
     if ro_name:
         ro = frappe.get_doc("Repair Order", ro_name)
         # Update sales_order field if not already set (for first SO only)
@@ -455,21 +454,9 @@ def update_ro_from_sales_order(so_doc, method=None):
 
 def update_ro_from_sales_invoice(si_doc, method=None):
     """Update RO invoiced_amount and sales_invoice field when SI is submitted/cancelled."""
-    # Find RO via parent field or sales invoice items
-    ro_name = si_doc.custom_repair_order if hasattr(si_doc, 'custom_repair_order') else None
-    if not ro_name:
-        for item in (si_doc.items or []):
-            if hasattr(item, 'repair_order') and item.repair_order:
-                ro_name = item.repair_order
-                break
+    ro_name = voucher_repair_order(si_doc)
     if ro_name:
-        ro = frappe.get_doc("Repair Order", ro_name)
-        # Update sales_invoice field if not already set (for first invoice only)
-        if not ro.sales_invoice and si_doc.docstatus == 1:
-            ro.sales_invoice = si_doc.name
-        _recompute_costs(ro)
-        ro.flags.ignore_validate_update_after_submit = True
-        ro.save(ignore_permissions=True)
+        _post_costs(si_doc, linked_voucher_amounts(si_doc, ro_name))
 
 
 def _update_job_costing_snapshot(doc):
@@ -497,6 +484,10 @@ def _update_job_costing_snapshot(doc):
         jc.insert(ignore_permissions=True)
 
 
+# Returned by set_status
+SET_STATUS_FIELDS = ["name", "status", "delivered_on", "modified"]
+
+
 @frappe.whitelist()
 def set_status(name: str, status: str):
     """Manually set RO status (for Scheduled, On Hold, Cancelled)."""
@@ -504,9 +495,7 @@ def set_status(name: str, status: str):
     if status not in allowed_statuses:
         frappe.throw(f"Cannot manually set status to {status}. Use buttons for: {', '.join(allowed_statuses)}")
     
-    doc = frappe.get_doc("Repair Order", name)
-    doc.status = status
-    doc.flags.ignore_validate_update_after_submit = True
-    doc.save(ignore_permissions=True)
+    apply_transition(name, status)
     frappe.msgprint(f"Status updated to {status}", alert=True, indicator="blue")
-    return doc.as_dict()
+    # The form reloads itself; callers only need what the transition changed
+    return frappe.db.get_value("Repair Order", name, SET_STATUS_FIELDS, as_dict=True)
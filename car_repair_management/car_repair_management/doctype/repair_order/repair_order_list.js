@@ -0,0 +1,35 @@
+// Copyright (c) 2025, Selfmade Cloud Solutions and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Repair Order"] = {
+	onload(listview) {
+		// Status changes are pushed by car_repair_management.repair_status.publish_status_event
+		frappe.realtime.doctype_subscribe("Repair Order");
+		frappe.realtime.off("repair_order_status");
+		frappe.realtime.on("repair_order_status", (data) => {
+			if (listview.view_name === "Kanban") {
+				move_kanban_card(listview, data);
+			} else if (listview.data.some((d) => d.name === data.name)) {
+				listview.refresh();
+			}
+		});
+	},
+};
+
+function move_kanban_card(listview, data) {
+	const $wrapper = listview.$result;
+	const $card = $wrapper.find(`.kanban-card-wrapper[data-name="${CSS.escape(data.name)}"]`);
+	const $cards = $wrapper.find(`.kanban-column[data-column-value="${CSS.escape(data.status)}"] .kanban-cards`);
+	// ROs filtered out of the board are not our concern
+	if (!$card.length) return;
+	if (!$cards.length) {
+		// No column for the new status yet: let the board rebuild its columns
+		listview.refresh();
+		return;
+	}
+	if (!$card.parent().is($cards)) {
+		$card.prependTo($cards);
+	}
+	const row = listview.data.find((d) => d.name === data.name);
+	if (row) row.status = data.status;
+}
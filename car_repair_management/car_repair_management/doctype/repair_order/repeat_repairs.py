@@ -0,0 +1,85 @@
+"""Repeat repair detection.
+
+A return is a submitted Repair Order whose vehicle was delivered on its
+previous RO no more than `days` before the new one was opened. The previous RO
+is found with LAG() over the vehicle's ROs, so each RO is compared with its
+immediate predecessor only. ROs delivered before `delivered_on` existed fall
+back to their creation date.
+"""
+import frappe
+from frappe.utils import add_days, cint
+
+DEFAULT_RETURN_DAYS = 30
+# Redis hash per vehicle, one field per `days` value
+VEHICLE_CACHE_KEY = "repeat_repairs::{vehicle}"
+
+_RETURNS_QUERY = """
+    select t.vehicle, t.prev_ro as first_ro, date(t.prev_delivery) as first_date,
+        t.name as return_ro, date(t.creation) as return_date,
+        datediff(t.creation, t.prev_delivery) as days_since_delivery,
+        t.problem_summary as issue_category
+    from (
+        select name, vehicle, creation, problem_summary,
+            lag(name) over w as prev_ro,
+            lag(ifnull(delivered_on, creation)) over w as prev_delivery
+        from `tabRepair Order`
+        where docstatus = 1 and {vehicle_condition}
+        window w as (partition by vehicle order by creation, name)
+    ) t
+    where t.prev_ro is not null
+        and datediff(t.creation, t.prev_delivery) between 0 and %(days)s
+        {window_condition}
+"""
+
+
+def get_repeat_repairs(days=DEFAULT_RETURN_DAYS, from_date=None, to_date=None, vehicle=None, limit=None, offset=0):
+    """Return (rows, total) of returns opened between `from_date` and `to_date`, newest first."""
+    query, values = _build_query(days, from_date, to_date, vehicle)
+    total = frappe.db.sql(f"select count(*) from ({query}) r", values)[0][0]
+    paging = ""
+    if limit:
+        paging = "limit %(limit)s offset %(offset)s"
+        values.update(limit=cint(limit), offset=cint(offset))
+    rows = frappe.db.sql(f"{query} order by t.creation desc, t.name desc {paging}", values, as_dict=True)
+    return rows, total
+
+
+def get_vehicle_repeat_repairs(vehicle, days=DEFAULT_RETURN_DAYS):
+    """All returns of one vehicle, cached until an RO of that vehicle is submitted or delivered."""
+    key, field = VEHICLE_CACHE_KEY.format(vehicle=vehicle), str(cint(days))
+    rows = frappe.cache.hget(key, field)
+    if rows is None:
+        rows, _total = get_repeat_repairs(days, vehicle=vehicle)
+        frappe.cache.hset(key, field, rows)
+    return rows
+
+
+def clear_vehicle_cache(vehicle):
+    if vehicle:
+        frappe.cache.delete_value(VEHICLE_CACHE_KEY.format(vehicle=vehicle))
+
+
+def _build_query(days, from_date, to_date, vehicle):
+    values = {"days": cint(days) if days is not None else DEFAULT_RETURN_DAYS}
+    window = []
+    if from_date:
+        window.append("creation >= %(from_date)s")
+        values["from_date"] = from_date
+    if to_date:
+        window.append("creation < %(to_date)s")
+        values["to_date"] = add_days(to_date, 1)
+
+    if vehicle:
+        vehicle_condition = "vehicle = %(vehicle)s"
+        values["vehicle"] = vehicle
+    elif window:
+        # Only vehicles with an RO in the window can have a return in it; their
+        # whole history is still read so LAG() sees the true predecessor
+        vehicle_condition = "vehicle in (select vehicle from `tabRepair Order` where docstatus = 1 and {0})".format(
+            " and ".join(window)
+        )
+    else:
+        vehicle_condition = "ifnull(vehicle, '') != ''"
+
+    window_condition = "".join(f" and t.{cond}" for cond in window)
+    return _RETURNS_QUERY.format(vehicle_condition=vehicle_condition, window_condition=window_condition), values
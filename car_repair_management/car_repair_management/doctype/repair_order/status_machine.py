@@ -0,0 +1,165 @@
+"""Repair Order status state machine (see RO_STATUS_DESIGN.md).
+
+TRANSITIONS declares, per status, the statuses it may move to and the guards
+that must pass first. All guards of a transition are evaluated by one query.
+`apply_transition` moves an RO with a targeted update of its status columns
+and a Repair Order Status Log row instead of a full document save; saves that
+change the status (form, Kanban) are checked by `check_transition` from
+before_update_after_submit.
+"""
+import frappe
+from frappe.utils import now_datetime
+
+from car_repair_management.car_repair_management.doctype.repair_order.recompute_queue import queue_recompute
+from car_repair_management.car_repair_management.doctype.repair_order.repeat_repairs import clear_vehicle_cache
+from car_repair_management.car_repair_management.doctype.repair_order.task_routing import clear_task_route
+from car_repair_management.car_repair_management.doctype.repair_order_status_log.repair_order_status_log import (
+    log_status_change,
+)
+from car_repair_management.repair_status import clear_repair_status_cache, publish_status_event
+from car_repair_management.report_cache import invalidate_reports_reading
+from car_repair_management.vehicle_rollups import on_repair_order_delivered
+
+HOLD = {"On Hold": (), "Cancelled": ()}
+
+# status -> {next status: guards}
+TRANSITIONS = {
+    "Draft": {"Scheduled": (), **HOLD},
+    "Scheduled": {"In Progress": (), **HOLD},
+    "In Progress": {"Awaiting Parts": (), "Completed": ("tasks_closed",), "Ready for Handover": ("qc_closed",), **HOLD},
+    "Awaiting Parts": {"In Progress": ("parts_available",), "Ready for Handover": ("qc_closed",), **HOLD},
+    "Completed": {"In Progress": (), "Invoiced": (), "Ready for Handover": ("qc_closed",), **HOLD},
+    "Invoiced": {"Ready for Handover": ("qc_closed",), "Delivered": (), "Closed": ("invoice_paid",)},
+    "Ready for Handover": {"In Progress": (), "Invoiced": (), "Delivered": (), **HOLD},
+    "Delivered": {"Closed": ("invoice_paid",)},
+    "On Hold": {"Scheduled": (), "In Progress": (), "Awaiting Parts": (), "Cancelled": ()},
+    "Closed": {},
+    "Cancelled": {},
+}
+
+# guard -> (subquery returning what blocks the transition, or null when it passes; message)
+GUARDS = {
+    "qc_closed": (
+        """
+        select group_concat(ifnull(nullif(op.operation_name, ''), op.task) separator ', ')
+        from `tabRepair Operation Line` op
+        join `tabTask` t on t.name = op.task
+        where op.parent = %(name)s and op.parenttype = 'Repair Order' and op.is_qc = 1 and t.status != 'Closed'
+        """,
+        "QC tasks incomplete: {}",
+    ),
+    "tasks_closed": (
+        # Task counters kept on the RO by task_routing; an RO without closed tasks has no work done
+        """
+        select case
+            when ifnull(open_tasks, 0) > 0 then concat('Open tasks: ', open_tasks, '.')
+            when ifnull(closed_tasks, 0) = 0 then 'No closed tasks.'
+        end
+        from `tabRepair Order`
+        where name = %(name)s
+        """,
+        "{}",
+    ),
+    "invoice_paid": (
+        """
+        select si.name
+        from `tabSales Invoice` si
+        where si.name = %(sales_invoice)s and si.status not in ('Paid', 'Submitted')
+        """,
+        "Linked Sales Invoice {} not fully paid.",
+    ),
+    "parts_available": (
+        """
+        select group_concat(plan.item_code separator ', ')
+        from (
+            select item_code, sum(qty_planned) as qty_planned
+            from `tabRepair Parts Plan`
+            where parent = %(name)s and parenttype = 'Repair Order'
+            group by item_code
+        ) plan
+        left join (
+            select item_code, sum(qty) as qty
+            from `tabParts Consumption Daily`
+            where repair_order = %(name)s
+            group by item_code
+        ) issued on issued.item_code = plan.item_code
+        left join (
+            select item_code, sum(actual_qty) as qty
+            from `tabBin`
+            where item_code in (select item_code from `tabRepair Parts Plan` where parent = %(name)s)
+            group by item_code
+        ) stock on stock.item_code = plan.item_code
+        where plan.qty_planned > ifnull(issued.qty, 0) + ifnull(stock.qty, 0)
+        """,
+        "Parts not available: {}",
+    ),
+}
+
+RO_FIELDS = ["name", "status", "docstatus", "sales_invoice", "vehicle", "delivered_on", "total_job_cost"]
+
+
+def check_transition(ro, from_status, to_status):
+    """Throw unless `ro` (doc or dict with name and sales_invoice) may move from `from_status` to `to_status`."""
+    error = get_transition_error(ro, from_status, to_status)
+    if error:
+        frappe.throw(error)
+
+
+def get_transition_error(ro, from_status, to_status):
+    """Why `ro` cannot move from `from_status` to `to_status`, or None if it can."""
+    allowed = TRANSITIONS.get(from_status or "Draft", {})
+    if to_status not in allowed:
+        return f"Cannot change status from {from_status} to {to_status}"
+
+    guards = allowed[to_status]
+    if not guards:
+        return None
+    result = frappe.db.sql(
+        get_guards_query(guards), {"name": ro.name, "sales_invoice": ro.get("sales_invoice")}, as_dict=True
+    )[0]
+    failures = [GUARDS[g][1].format(result[g]) for g in guards if result[g]]
+    return f"Cannot set {to_status}. " + " ".join(failures) if failures else None
+
+
+def get_guards_query(guards):
+    """One select evaluating every guard in `guards`, each as a column named after it."""
+    return "select {}".format(", ".join(f"({GUARDS[g][0]}) as {g}" for g in guards))
+
+
+def apply_transition(name, to_status, throw=True):
+    """Move Repair Order `name` to `to_status` without saving the document.
+
+    Returns False when it already has that status, or when the transition is
+    not allowed and `throw` is off.
+    """
+    ro = frappe.db.get_value("Repair Order", name, RO_FIELDS, as_dict=True, for_update=True)
+    if not ro:
+        frappe.throw(f"Repair Order {name} not found")
+    if ro.status == to_status:
+        return False
+    error = get_transition_error(ro, ro.status, to_status)
+    if error:
+        if throw:
+            frappe.throw(error)
+        return False
+
+    from_status = ro.status
+    values = {"status": to_status}
+    delivered = to_status == "Delivered" and not ro.delivered_on
+    if delivered:
+        values["delivered_on"] = now_datetime()
+    frappe.db.set_value("Repair Order", name, values)
+    ro.update(values)
+    log_status_change(name, from_status, to_status)
+
+    # What the Repair Order doc events would have done on a save
+    if delivered:
+        clear_vehicle_cache(ro.vehicle)
+        on_repair_order_delivered(ro)
+    invalidate_reports_reading("Repair Order", values)
+    # A save would have recomputed costs and refreshed the Job Costing snapshot
+    queue_recompute(name)
+    clear_repair_status_cache(name)
+    clear_task_route(name)
+    publish_status_event(name, to_status)
+    return True
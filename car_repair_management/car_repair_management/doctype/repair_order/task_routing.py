@@ -0,0 +1,171 @@
+"""Task -> Repair Order routing: open / closed task counters and their cache.
+
+Every Repair Order carries `open_tasks` and `closed_tasks`, adjusted with one
+atomic UPDATE of the RO row whenever one of its Tasks is created, changes
+between open and closed, moves to another RO or is deleted.
+`reconcile_task_counters` recounts them from Task every hour to correct drift
+from writes that bypass document events.
+
+For the Task on_update hook the RO's status and counters are also cached in
+Redis per RO, so it can decide from memory whether a task change can move the
+RO at all:
+
+- the entry is dropped whenever the RO changes status, by a save or by the
+  status machine, and whenever its counters change; a task change that moves
+  the counters reads them back from the RO row, since its own update is not
+  committed yet and must not reach the cache
+- missing entries are reloaded from the RO row; they expire after ROUTE_TTL
+  seconds
+
+The status machine guards still verify a transition before it is applied.
+"""
+import frappe
+from frappe.utils import cint
+
+ROUTE_KEY = "repair_order_task_route::{}::{}"
+ROUTE_PARTS = ("status", "open_tasks", "closed_tasks")
+ROUTE_TTL = 3600
+CLOSED_TASK_STATUSES = ("Completed", "Closed", "Cancelled")
+
+
+def track_task_change(task_doc, deleted=False):
+    """Count `task_doc`'s change on the task counters of its RO(s).
+
+    Status changes, inserts and deletes move the counts of the Task's RO; a
+    changed `repair_order` moves them from the old RO to the new one. Returns
+    the current RO's (status, open_tasks, closed_tasks), or None without one.
+    """
+    repair_order = None if deleted else task_doc.get("repair_order")
+    if deleted:
+        before_ro, before_state = task_doc.get("repair_order"), _state(task_doc.status)
+    else:
+        before = task_doc.get_doc_before_save()
+        before_ro, before_state = (before.get("repair_order"), _state(before.status)) if before else (None, None)
+
+    deltas = {}
+    if before_ro:
+        deltas[before_ro] = _counts(before_state, -1)
+    if repair_order:
+        open_delta, closed_delta = deltas.get(repair_order, (0, 0))
+        after_open, after_closed = _counts(_state(task_doc.status), 1)
+        deltas[repair_order] = (open_delta + after_open, closed_delta + after_closed)
+
+    for name, (open_delta, closed_delta) in deltas.items():
+        if not (open_delta or closed_delta):
+            continue
+        # Atomic on the RO row; concurrent task changes queue on its lock
+        frappe.db.sql(
+            """
+            update `tabRepair Order`
+            set open_tasks = ifnull(open_tasks, 0) + %(open)s, closed_tasks = ifnull(closed_tasks, 0) + %(closed)s
+            where name = %(name)s
+            """,
+            {"name": name, "open": open_delta, "closed": closed_delta},
+        )
+        # The new counters are uncommitted: never cache them
+        clear_task_route(name)
+
+    if not repair_order:
+        return None
+    if any(deltas[repair_order]):
+        return _read_route(repair_order)
+
+    # Plain string keys read raw, not through the pickling get_value
+    status, open_tasks, closed_tasks = frappe.cache.mget(_route_keys(repair_order))
+    if status is None or open_tasks is None or closed_tasks is None:
+        return _load_route(repair_order)
+    return frappe.safe_decode(status), cint(open_tasks), cint(closed_tasks)
+
+
+def clear_task_route(repair_order):
+    """Forget the cached status and counters of `repair_order` (now, and after commit or rollback)."""
+    keys = _route_keys(repair_order)
+    frappe.cache.delete(*keys)
+    # Entries loaded later in this transaction may hold its uncommitted values
+    frappe.db.after_commit.add(lambda: frappe.cache.delete(*keys))
+    frappe.db.after_rollback.add(lambda: frappe.cache.delete(*keys))
+
+
+def on_task_trash(doc, method=None):
+    if doc.get("repair_order"):
+        track_task_change(doc, deleted=True)
+
+
+def on_repair_order_change(doc, method=None):
+    """Repair Order on_update_after_submit / on_cancel: drop the route when the status moved."""
+    before = doc.get_doc_before_save()
+    if not before or before.status != doc.status or doc.docstatus == 2:
+        clear_task_route(doc.name)
+
+
+def _read_route(repair_order):
+    status, open_tasks, closed_tasks = frappe.db.get_value("Repair Order", repair_order, ROUTE_PARTS) or (None, 0, 0)
+    return status or "", cint(open_tasks), cint(closed_tasks)
+
+
+def _load_route(repair_order):
+    route = _read_route(repair_order)
+    for key, value in zip(_route_keys(repair_order), route):
+        frappe.cache.set(key, value, ex=ROUTE_TTL)
+    return route
+
+
+def reconcile_task_counters(repair_order=None, verify_only=False):
+    """Recount open / closed tasks of draft and submitted ROs from Task and correct drifted counters.
+
+    Runs hourly, to repair counts missed by Task changes that skip document
+    events (db_set, bulk updates). Returns the ROs whose counters differed,
+    with the stored and counted values. With `verify_only` nothing is written.
+
+    bench --site <site> execute car_repair_management.car_repair_management.doctype.repair_order.task_routing.reconcile_task_counters
+    """
+    values = {"closed": CLOSED_TASK_STATUSES, "ro": repair_order}
+    source = f"""
+        `tabRepair Order` ro
+        left join (
+            select repair_order, sum(status not in %(closed)s) as open_tasks, sum(status in %(closed)s) as closed_tasks
+            from `tabTask`
+            where {"repair_order = %(ro)s" if repair_order else "ifnull(repair_order, '') != ''"}
+            group by repair_order
+        ) t on t.repair_order = ro.name
+    """
+    drifted = f"""
+        ro.docstatus < 2 {"and ro.name = %(ro)s" if repair_order else ""}
+        and (ifnull(ro.open_tasks, 0) != ifnull(t.open_tasks, 0) or ifnull(ro.closed_tasks, 0) != ifnull(t.closed_tasks, 0))
+    """
+    drift = frappe.db.sql(
+        f"""
+        select ro.name as repair_order, ro.open_tasks, ro.closed_tasks,
+            ifnull(t.open_tasks, 0) as counted_open_tasks, ifnull(t.closed_tasks, 0) as counted_closed_tasks
+        from {source}
+        where {drifted}
+        """,
+        values,
+        as_dict=True,
+    )
+    if drift and not verify_only:
+        frappe.db.sql(
+            f"""
+            update {source}
+            set ro.open_tasks = ifnull(t.open_tasks, 0), ro.closed_tasks = ifnull(t.closed_tasks, 0)
+            where {drifted}
+            """,
+            values,
+        )
+        for row in drift:
+            clear_task_route(row.repair_order)
+    return drift
+
+
+def _route_keys(repair_order):
+    return [frappe.cache.make_key(ROUTE_KEY.format(repair_order, part)) for part in ROUTE_PARTS]
+
+
+def _state(status):
+    if not status:
+        return None
+    return "closed" if status in CLOSED_TASK_STATUSES else "open"
+
+
+def _counts(state, sign):
+    return sign * (state == "open"), sign * (state == "closed")
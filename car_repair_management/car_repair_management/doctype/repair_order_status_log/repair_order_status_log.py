@@ -0,0 +1,41 @@
+"""Repair Order status transitions.
+
+One row per status change, written from the Repair Order doc events so every
+save (form, Kanban board, plain saves) is covered, and by the status machine's
+targeted updates through `log_status_change`. The latest row of an RO tells
+since when it has been in its current status.
+"""
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now
+
+
+class RepairOrderStatusLog(Document):
+    def validate(self):
+        if not self.is_new():
+            frappe.throw("Repair Order Status Log cannot be modified.")
+
+
+def record_status_change(doc, method=None):
+    """Repair Order on_update / on_update_after_submit: log the status if it changed."""
+    before = doc.get_doc_before_save()
+    from_status = before.status if before else None
+    if not doc.status or from_status == doc.status:
+        return
+    log_status_change(doc.name, from_status, doc.status)
+
+
+def log_status_change(repair_order, from_status, status):
+    frappe.get_doc({
+        "doctype": "Repair Order Status Log",
+        "repair_order": repair_order,
+        "from_status": from_status,
+        "status": status,
+        "changed_on": now(),
+        "changed_by": frappe.session.user,
+    }).insert(ignore_permissions=True)
+
+
+def delete_status_logs(doc, method=None):
+    """Repair Order on_trash: a deleted draft takes its log with it instead of being blocked by it."""
+    frappe.db.delete("Repair Order Status Log", {"repair_order": doc.name})
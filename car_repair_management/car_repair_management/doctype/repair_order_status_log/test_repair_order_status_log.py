@@ -0,0 +1,33 @@
+# Copyright (c) 2025, Selfmade Cloud Solutions and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from car_repair_management.tests.test_repair_order import make_repair_order
+
+
+class TestRepairOrderStatusLog(FrappeTestCase):
+	def logs(self, repair_order):
+		return frappe.get_all(
+			"Repair Order Status Log",
+			filters={"repair_order": repair_order},
+			fields=["name", "from_status", "status"],
+			order_by="changed_on, creation",
+		)
+
+	def test_status_changes_are_logged_once(self):
+		ro = make_repair_order()
+		ro.status = "On Hold"
+		ro.save()
+		ro.save()
+		self.assertEqual(
+			[(r.from_status, r.status) for r in self.logs(ro.name)],
+			[(None, "Draft"), ("Draft", "On Hold")],
+		)
+
+	def test_log_is_append_only(self):
+		ro = make_repair_order()
+		log = frappe.get_doc("Repair Order Status Log", self.logs(ro.name)[0].name)
+		log.status = "Closed"
+		self.assertRaises(frappe.ValidationError, log.save)
@@ -0,0 +1,32 @@
+# Copyright (c) 2025, Selfmade Cloud Solutions and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import getdate
+
+from car_repair_management.tests.test_repair_order import _ensure_vehicle, make_repair_order
+
+
+def repair_orders(vehicle, creation):
+	return frappe.db.get_value(
+		"Vehicle Repair Order Daily", {"vehicle": vehicle, "creation_date": getdate(creation)}, "repair_orders"
+	) or 0
+
+
+class TestVehicleRepairOrderDaily(FrappeTestCase):
+	def test_counts_follow_insert_vehicle_change_and_delete(self):
+		first = make_repair_order(vehicle="TEST-VEH-ROLLUP-1")
+		before = repair_orders("TEST-VEH-ROLLUP-1", first.creation)
+		second = make_repair_order(vehicle="TEST-VEH-ROLLUP-1")
+		self.assertEqual(repair_orders("TEST-VEH-ROLLUP-1", first.creation), before + 1)
+
+		_ensure_vehicle("TEST-VEH-ROLLUP-2")
+		other_before = repair_orders("TEST-VEH-ROLLUP-2", second.creation)
+		second.vehicle = "TEST-VEH-ROLLUP-2"
+		second.save()
+		self.assertEqual(repair_orders("TEST-VEH-ROLLUP-1", first.creation), before)
+		self.assertEqual(repair_orders("TEST-VEH-ROLLUP-2", second.creation), other_before + 1)
+
+		frappe.delete_doc("Repair Order", second.name)
+		self.assertEqual(repair_orders("TEST-VEH-ROLLUP-2", second.creation), other_before)
@@ -0,0 +1,99 @@
+"""Repair Orders created per Vehicle and day.
+
+Maintained from Repair Order insert, vehicle change, cancel and delete so the
+Vehicle dashboard heatmap reads one indexed range of pre-counted days instead
+of grouping `tabRepair Order` on every form load. Row names are derived from
+(vehicle, creation_date) so postings upsert.
+"""
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate, now
+
+# Deterministic row name for (vehicle, creation_date)
+ROW_NAME = "md5(concat_ws('|', {vehicle}, {creation_date}))"
+HEATMAP_CACHE_KEY = "vehicle_heatmap::{}"
+
+
+class VehicleRepairOrderDaily(Document):
+    pass
+
+
+def on_repair_order_insert(doc, method=None):
+    _post(doc.vehicle, doc.creation, 1)
+
+
+def on_repair_order_update(doc, method=None):
+    """Move a draft's count when its vehicle is changed."""
+    previous = doc.get_doc_before_save()
+    if previous and previous.vehicle != doc.vehicle:
+        _post(previous.vehicle, doc.creation, -1)
+        _post(doc.vehicle, doc.creation, 1)
+
+
+def on_repair_order_cancel(doc, method=None):
+    _post(doc.vehicle, doc.creation, -1)
+
+
+def on_repair_order_trash(doc, method=None):
+    # Cancelled ROs were already taken out on cancel
+    if doc.docstatus == 0:
+        _post(doc.vehicle, doc.creation, -1)
+
+
+def _post(vehicle, creation, delta):
+    if not vehicle:
+        return
+    values = {"vehicle": vehicle, "creation_date": getdate(creation), "delta": delta,
+              "now": now(), "user": frappe.session.user}
+    name = ROW_NAME.format(vehicle="%(vehicle)s", creation_date="%(creation_date)s")
+    frappe.db.sql(
+        f"""
+        insert into `tabVehicle Repair Order Daily`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             vehicle, creation_date, repair_orders)
+        values ({name}, %(now)s, %(now)s, %(user)s, %(user)s, 0, 0,
+            %(vehicle)s, %(creation_date)s, %(delta)s)
+        on duplicate key update
+            repair_orders = repair_orders + values(repair_orders),
+            modified = values(modified)
+        """,
+        values,
+    )
+    if delta < 0:
+        frappe.db.sql(
+            """
+            delete from `tabVehicle Repair Order Daily`
+            where vehicle = %(vehicle)s and creation_date = %(creation_date)s and repair_orders <= 0
+            """,
+            values,
+        )
+    frappe.db.after_commit.add(lambda: clear_heatmap_cache(vehicle))
+
+
+def clear_heatmap_cache(vehicle):
+    frappe.cache.delete_value(HEATMAP_CACHE_KEY.format(vehicle))
+
+
+@frappe.whitelist()
+def rebuild_vehicle_repair_order_daily():
+    """Recreate the rollup from non-cancelled Repair Orders in one set-based statement."""
+    frappe.only_for("System Manager")
+    frappe.db.delete("Vehicle Repair Order Daily")
+    name = ROW_NAME.format(vehicle="t.vehicle", creation_date="t.creation_date")
+    frappe.db.sql(
+        f"""
+        insert into `tabVehicle Repair Order Daily`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             vehicle, creation_date, repair_orders)
+        select {name}, %(now)s, %(now)s, %(user)s, %(user)s, 0, 0,
+            t.vehicle, t.creation_date, t.repair_orders
+        from (
+            select vehicle, date(creation) as creation_date, count(*) as repair_orders
+            from `tabRepair Order`
+            where docstatus < 2 and ifnull(vehicle, '') != ''
+            group by vehicle, date(creation)
+        ) t
+        """,
+        {"now": now(), "user": frappe.session.user},
+    )
+    return frappe.db.count("Vehicle Repair Order Daily")
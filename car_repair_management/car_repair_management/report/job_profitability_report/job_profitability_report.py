@@ -1,28 +1,122 @@
 import frappe
+from frappe.utils import add_days, cint, flt
+
+from car_repair_management.report_cache import get_cached_result
+
+# Sort options exposed in the report filters -> SQL expression
+SORT_COLUMNS = {
+    "Creation": "ro.creation",
+    "Total Cost": "ro.total_job_cost",
+    "Invoiced": "invoiced",
+    "Profit": "profit",
+    "Margin %": "margin_percent",
+}
+DEFAULT_PAGE_LENGTH = 500
+
+COLUMNS = [
+    {"label": "Repair Order", "fieldname": "repair_order", "fieldtype": "Link", "options": "Repair Order", "width": 180},
+    {"label": "Customer", "fieldname": "customer", "fieldtype": "Link", "options": "Customer", "width": 160},
+    {"label": "Vehicle", "fieldname": "vehicle", "fieldtype": "Link", "options": "Vehicle", "width": 140},
+    {"label": "Status", "fieldname": "status", "fieldtype": "Data", "width": 120},
+    {"label": "Parts Cost", "fieldname": "parts_cost", "fieldtype": "Currency", "width": 120},
+    {"label": "Labor Cost", "fieldname": "labor_cost", "fieldtype": "Currency", "width": 120},
+    {"label": "Other Charges", "fieldname": "other_charges", "fieldtype": "Currency", "width": 120},
+    {"label": "Actual Cost", "fieldname": "actual", "fieldtype": "Currency", "width": 150},
+    {"label": "Invoiced Amount", "fieldname": "invoiced", "fieldtype": "Currency", "width": 150},
+    {"label": "Profit", "fieldname": "profit", "fieldtype": "Currency", "width": 150},
+    {"label": "Margin %", "fieldname": "margin_percent", "fieldtype": "Percent", "width": 100},
+]
+
 
 def execute(filters=None):
+    return get_cached_result("job_profitability", filters, _execute)
+
+
+def _execute(filters):
     filters = filters or {}
-    columns = [
-        {"label": "Repair Order", "fieldname": "repair_order", "fieldtype": "Link", "options": "Repair Order", "width": 180},
-        {"label": "Invoiced Amount", "fieldname": "invoiced", "fieldtype": "Currency", "width": 150},
-        {"label": "Actual Cost", "fieldname": "actual", "fieldtype": "Currency", "width": 150},
-        {"label": "Profit", "fieldname": "profit", "fieldtype": "Currency", "width": 150}
+    grouped, params = _grouped_query(filters)
+
+    page_length = cint(filters.get("page_length")) or DEFAULT_PAGE_LENGTH
+    page = max(cint(filters.get("page")), 1)
+    params.update(limit=page_length, offset=(page - 1) * page_length)
+
+    data = frappe.db.sql(
+        f"{grouped} {_order_by(filters)} limit %(limit)s offset %(offset)s",
+        params,
+        as_dict=True,
+    )
+    for row in data:
+        row.pop("creation", None)
+
+    totals = frappe.db.sql(
+        f"""
+        select count(*) as ros, ifnull(sum(actual), 0) as actual,
+            ifnull(sum(invoiced), 0) as invoiced, ifnull(sum(profit), 0) as profit
+        from ({grouped}) t
+        """,
+        params,
+        as_dict=True,
+    )[0]
+    margin = (flt(totals.profit) * 100 / flt(totals.invoiced)) if flt(totals.invoiced) else 0
+    pages = -(-cint(totals.ros) // page_length)
+    report_summary = [
+        {"value": totals.ros, "label": "Repair Orders", "datatype": "Int"},
+        {"value": totals.actual, "label": "Actual Cost", "datatype": "Currency"},
+        {"value": totals.invoiced, "label": "Invoiced", "datatype": "Currency"},
+        {"value": totals.profit, "label": "Profit", "datatype": "Currency",
+         "indicator": "Green" if flt(totals.profit) >= 0 else "Red"},
+        {"value": margin, "label": "Margin %", "datatype": "Percent"},
+        {"value": f"{page} / {pages or 1}", "label": "Page", "datatype": "Data"},
     ]
-    data = []
-    ros = frappe.get_all("Repair Order", fields=["name", "total_job_cost"], filters={})
-    for ro in ros:
-        inv = frappe.db.sql(
-            """
-            SELECT COALESCE(SUM(net_amount), 0) FROM `tabSales Invoice Item`
-            WHERE repair_order=%s
-            """,
-            ro.name,
-        )[0][0]
-        actual = ro.total_job_cost or 0
-        data.append({
-            "repair_order": ro.name,
-            "invoiced": inv,
-            "actual": actual,
-            "profit": (inv - actual)
-        })
-    return columns, data
+
+    return COLUMNS, data, None, None, report_summary
+
+
+def get_export_query(filters):
+    """(columns, query, params) of all matching rows, for the streaming export."""
+    grouped, params = _grouped_query(filters)
+    return COLUMNS, f"{grouped} {_order_by(filters)}", params
+
+
+def _grouped_query(filters):
+    conditions, params = _get_conditions(filters)
+    # Invoiced amount from submitted Sales Invoice Items, aggregated per RO in the same query
+    grouped = f"""
+        select ro.name as repair_order, ro.customer, ro.vehicle, ro.status, ro.creation,
+            ifnull(ro.parts_cost, 0) as parts_cost,
+            ifnull(ro.labor_cost, 0) as labor_cost,
+            ifnull(ro.other_charges, 0) as other_charges,
+            ifnull(ro.total_job_cost, 0) as actual,
+            ifnull(sum(sii.net_amount), 0) as invoiced,
+            ifnull(sum(sii.net_amount), 0) - ifnull(ro.total_job_cost, 0) as profit,
+            case when ifnull(sum(sii.net_amount), 0) = 0 then 0
+                else (ifnull(sum(sii.net_amount), 0) - ifnull(ro.total_job_cost, 0)) * 100 / sum(sii.net_amount)
+            end as margin_percent
+        from `tabRepair Order` ro
+        left join `tabSales Invoice Item` sii on sii.repair_order = ro.name and sii.docstatus = 1
+        where {conditions}
+        group by ro.name
+    """
+    return grouped, params
+
+
+def _order_by(filters):
+    sort_column = SORT_COLUMNS.get(filters.get("sort_by"), "ro.creation")
+    sort_order = "asc" if filters.get("sort_order") == "Ascending" else "desc"
+    return f"order by {sort_column} {sort_order}, ro.name {sort_order}"
+
+
+def _get_conditions(filters):
+    conditions = ["ro.docstatus < 2"]
+    params = {}
+    if filters.get("from_date"):
+        conditions.append("ro.creation >= %(from_date)s")
+        params["from_date"] = filters.get("from_date")
+    if filters.get("to_date"):
+        conditions.append("ro.creation < %(to_date)s")
+        params["to_date"] = add_days(filters.get("to_date"), 1)
+    for field in ("customer", "vehicle", "status"):
+        if filters.get(field):
+            conditions.append(f"ro.{field} = %({field})s")
+            params[field] = filters.get(field)
+    return " and ".join(conditions), params
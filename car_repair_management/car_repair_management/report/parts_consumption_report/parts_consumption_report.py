@@ -1,83 +1,72 @@
 import frappe
-from frappe.utils import getdate
+from frappe.utils import flt
 
-def execute(filters=None):
-    filters = filters or {}
-    from_date = filters.get('from_date')
-    to_date = filters.get('to_date')
+from car_repair_management.report_cache import get_cached_result
 
-    conditions = []
-    params = []
-    if from_date:
-        conditions.append("ro.creation >= %s")
-        params.append(from_date)
-    if to_date:
-        conditions.append("ro.creation <= %s")
-        params.append(to_date)
-    where = (" where " + " and ".join(conditions)) if conditions else ""
+COLUMNS = [
+    {"label": "Repair Order", "fieldname": "repair_order", "fieldtype": "Link", "options": "Repair Order", "width": 160},
+    {"label": "Item Code", "fieldname": "item_code", "fieldtype": "Link", "options": "Item", "width": 160},
+    {"label": "Qty Issued", "fieldname": "qty", "fieldtype": "Float", "width": 100},
+    {"label": "Valuation Rate", "fieldname": "valuation_rate", "fieldtype": "Currency", "width": 120},
+    {"label": "Extended Cost", "fieldname": "extended_cost", "fieldtype": "Currency", "width": 140},
+    {"label": "Billable", "fieldname": "billable", "fieldtype": "Data", "width": 90},
+]
 
-    columns = [
-        {"label": "Repair Order", "fieldname": "repair_order", "fieldtype": "Link", "options": "Repair Order", "width": 160},
-        {"label": "Item Code", "fieldname": "item_code", "fieldtype": "Link", "options": "Item", "width": 160},
-        {"label": "Qty Issued", "fieldname": "qty", "fieldtype": "Float", "width": 100},
-        {"label": "Valuation Rate", "fieldname": "valuation_rate", "fieldtype": "Currency", "width": 120},
-        {"label": "Extended Cost", "fieldname": "extended_cost", "fieldtype": "Currency", "width": 140},
-        {"label": "Billable", "fieldname": "billable", "fieldtype": "Data", "width": 90},
-    ]
 
-    # Actual issued from Stock Entry Detail linked via reference to RO (if using custom field)
-    # Fallback: use parts_plan as planned and assume valuation_rate from Item
-    data = []
+def execute(filters=None):
+    return get_cached_result("parts_consumption", filters, _execute)
 
-    # Try stock entries first
-    issued = frappe.db.sql(
-        """
-        select sed.item_code, sum(sed.qty) as qty, avg(sed.valuation_rate) as valuation_rate, se.repair_order
-        from `tabStock Entry` se
-        join `tabStock Entry Detail` sed on sed.parent = se.name
-        where coalesce(se.repair_order, '') != ''
-        group by se.repair_order, sed.item_code
-        """,
-        as_dict=True,
-    )
-    billable_map = {}
-    # Build billable map from parts_plan
-    parts_flags = frappe.db.sql(
-        """
-        select parent as repair_order, item_code, max(case when is_billable=1 then 1 else 0 end) as is_billable
-        from `tabRepair Parts Plan`
-        group by parent, item_code
-        """,
-        as_dict=True,
-    )
-    for r in parts_flags:
-        billable_map[(r.repair_order, r.item_code)] = 'Billable' if r.is_billable else 'FoC'
 
-    total_billable = 0.0
-    total_foc = 0.0
+def _execute(filters):
+    filters = filters or {}
+    query, params = _consumption_query(filters)
+    data = frappe.db.sql(query, params, as_dict=True)
 
-    for row in issued:
-        bill = billable_map.get((row.repair_order, row.item_code), 'Billable')
-        extended = float(row.qty or 0) * float(row.valuation_rate or 0)
-        if bill == 'Billable':
-            total_billable += extended
-        else:
-            total_foc += extended
-        data.append({
-            'repair_order': row.repair_order,
-            'item_code': row.item_code,
-            'qty': row.qty,
-            'valuation_rate': row.valuation_rate,
-            'extended_cost': extended,
-            'billable': bill,
-        })
+    total_billable = sum(flt(row.extended_cost) for row in data if row.billable == "Billable")
+    total_foc = sum(flt(row.extended_cost) for row in data if row.billable == "FoC")
 
     chart = {
-        'data': {
-            'labels': ['Billable', 'FoC'],
-            'datasets': [{'name': 'Cost', 'values': [total_billable, total_foc]}]
+        "data": {
+            "labels": ["Billable", "FoC"],
+            "datasets": [{"name": "Cost", "values": [total_billable, total_foc]}]
         },
-        'type': 'pie'
+        "type": "pie"
     }
 
-    return columns, data, None, chart
+    return COLUMNS, data, None, chart
+
+
+def get_export_query(filters):
+    """(columns, query, params) of all matching rows, for the streaming export."""
+    query, params = _consumption_query(filters)
+    return COLUMNS, query, params
+
+
+def _consumption_query(filters):
+    # Issued parts come from the daily rollup maintained on Stock Entry submit/cancel;
+    # the date window is applied to the Stock Entry posting date in SQL
+    conditions, params = _get_conditions(filters)
+    query = f"""
+        select repair_order, item_code, sum(qty) as qty,
+            sum(amount) / nullif(sum(qty), 0) as valuation_rate,
+            sum(amount) as extended_cost,
+            if(is_billable, 'Billable', 'FoC') as billable
+        from `tabParts Consumption Daily`
+        where {conditions}
+        group by repair_order, item_code, is_billable
+        having sum(qty) != 0 or sum(amount) != 0
+        order by repair_order, item_code
+    """
+    return query, params
+
+
+def _get_conditions(filters):
+    conditions = ["1 = 1"]
+    params = {}
+    if filters.get("from_date"):
+        conditions.append("posting_date >= %(from_date)s")
+        params["from_date"] = filters.get("from_date")
+    if filters.get("to_date"):
+        conditions.append("posting_date <= %(to_date)s")
+        params["to_date"] = filters.get("to_date")
+    return " and ".join(conditions), params
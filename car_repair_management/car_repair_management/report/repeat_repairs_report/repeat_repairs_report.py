@@ -1,55 +1,68 @@
 import frappe
-from frappe.utils import add_days, nowdate
+from frappe.utils import cint
+
+from car_repair_management.car_repair_management.doctype.repair_order.repeat_repairs import (
+    DEFAULT_RETURN_DAYS,
+    get_repeat_repairs,
+    get_vehicle_repeat_repairs,
+)
+from car_repair_management.report_cache import get_cached_result
+
+DEFAULT_PAGE_LENGTH = 500
+
 
 def execute(filters=None):
+    return get_cached_result("repeat_repairs", filters, _execute)
+
+
+def _execute(filters):
     filters = filters or {}
-    days = int(filters.get('days') or 30)
-    since = add_days(nowdate(), -days)
+    days = cint(filters.get("days") or DEFAULT_RETURN_DAYS)
 
     columns = [
         {"label": "Vehicle", "fieldname": "vehicle", "fieldtype": "Link", "options": "Vehicle", "width": 160},
-        {"label": "First RO", "fieldname": "first_ro", "fieldtype": "Link", "options": "Repair Order", "width": 150},
-        {"label": "First Handover", "fieldname": "first_date", "fieldtype": "Date", "width": 120},
+        {"label": "Previous RO", "fieldname": "first_ro", "fieldtype": "Link", "options": "Repair Order", "width": 150},
+        {"label": "Previous Handover", "fieldname": "first_date", "fieldtype": "Date", "width": 130},
         {"label": "Return RO", "fieldname": "return_ro", "fieldtype": "Link", "options": "Repair Order", "width": 150},
         {"label": "Return Date", "fieldname": "return_date", "fieldtype": "Date", "width": 120},
+        {"label": "Days Since Handover", "fieldname": "days_since_delivery", "fieldtype": "Int", "width": 100},
         {"label": "Issue Category", "fieldname": "issue_category", "fieldtype": "Data", "width": 160},
     ]
 
-    # Rough heuristic: vehicle with at least 2 ROs in last X days
-    ros = frappe.db.sql(
-        """
-        select vehicle, name, status, owner, creation
-        from `tabRepair Order`
-        where creation >= %s
-        order by vehicle, creation
-        """,
-        since, as_dict=True
-    )
-
-    data = []
-    by_vehicle = {}
-    for r in ros:
-        by_vehicle.setdefault(r.vehicle, []).append(r)
-
-    for v, lst in by_vehicle.items():
-        if len(lst) >= 2:
-            first = lst[0]
-            for ret in lst[1:]:
-                data.append({
-                    'vehicle': v,
-                    'first_ro': first.name,
-                    'first_date': first.creation.date(),
-                    'return_ro': ret.name,
-                    'return_date': ret.creation.date(),
-                    'issue_category': None
-                })
+    page_length = cint(filters.get("page_length")) or DEFAULT_PAGE_LENGTH
+    page = max(cint(filters.get("page")), 1)
+    offset = (page - 1) * page_length
+
+    if filters.get("vehicle") and not (filters.get("from_date") or filters.get("to_date")):
+        # Single vehicle history is served from the per-vehicle cache
+        rows = get_vehicle_repeat_repairs(filters.get("vehicle"), days)
+        total, data = len(rows), rows[offset:offset + page_length]
+    else:
+        data, total = get_repeat_repairs(
+            days,
+            from_date=filters.get("from_date"),
+            to_date=filters.get("to_date"),
+            vehicle=filters.get("vehicle"),
+            limit=page_length,
+            offset=offset,
+        )
+
+    returns_by_vehicle = {}
+    for row in data:
+        returns_by_vehicle[row["vehicle"]] = returns_by_vehicle.get(row["vehicle"], 0) + 1
 
     chart = {
-        'data': {
-            'labels': [d['vehicle'] for d in data],
-            'datasets': [{'name': 'Returns', 'values': [1 for _ in data]}]
+        "data": {
+            "labels": list(returns_by_vehicle),
+            "datasets": [{"name": "Returns", "values": list(returns_by_vehicle.values())}]
         },
-        'type': 'bar'
+        "type": "bar"
     }
 
-    return columns, data, None, chart
+    pages = -(-cint(total) // page_length)
+    report_summary = [
+        {"value": total, "label": "Returns", "datatype": "Int"},
+        {"value": f"{page} / {pages or 1}", "label": "Page", "datatype": "Data"},
+    ]
+
+    return columns, data, None, chart, report_summary
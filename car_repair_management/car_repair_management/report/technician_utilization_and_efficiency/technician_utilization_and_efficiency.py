@@ -1,74 +1,127 @@
 import frappe
+from frappe.utils import add_days, flt
+
+from car_repair_management.capacity import get_period, get_utilization
+from car_repair_management.report_cache import get_cached_result
+
+# Report "Group By" option -> column of the per task/technician rows
+GROUP_BY = {
+    "Technician": "employee",
+    "Operation": "operation_name",
+    "Workstation": "workstation",
+}
+
 
 def execute(filters=None):
-    # Reuse logic similar to technician_utilization_report but add efficiency column
+    return get_cached_result("technician_efficiency", filters, _execute)
+
+
+def _execute(filters):
+    # Utilization against capacity, efficiency as planned operation hours vs hours logged on their tasks
     filters = filters or {}
-    from_date = filters.get('from_date')
-    to_date = filters.get('to_date')
     employee = filters.get('employee')
+    group_by = filters.get('group_by') if filters.get('group_by') in GROUP_BY else "Technician"
 
-    columns = [
-        {"label": "Employee", "fieldname": "employee", "fieldtype": "Link", "options": "Employee", "width": 180},
-        {"label": "Planned Hours", "fieldname": "planned", "fieldtype": "Float", "width": 140},
-        {"label": "Logged Hours", "fieldname": "logged", "fieldtype": "Float", "width": 140},
-        {"label": "Utilization %", "fieldname": "utilization", "fieldtype": "Percent", "width": 120},
-        {"label": "Efficiency %", "fieldname": "efficiency", "fieldtype": "Percent", "width": 120}
-    ]
+    from_date, to_date = get_period(filters)
+    efficiency = get_efficiency(from_date, to_date, GROUP_BY[group_by], employee)
 
-    conditions = " where ts.docstatus = 1"
-    params = []
-    if from_date:
-        conditions += " and tl.from_time >= %s"
-        params.append(from_date)
-    if to_date:
-        conditions += " and tl.to_time <= %s"
-        params.append(to_date)
-    if employee:
-        conditions += " and ts.employee = %s"
-        params.append(employee)
+    if group_by == "Technician":
+        columns = [
+            {"label": "Employee", "fieldname": "employee", "fieldtype": "Link", "options": "Employee", "width": 180},
+            {"label": "Capacity Hours", "fieldname": "capacity", "fieldtype": "Float", "width": 130},
+            {"label": "Logged Hours", "fieldname": "logged", "fieldtype": "Float", "width": 120},
+            {"label": "Utilization %", "fieldname": "utilization", "fieldtype": "Percent", "width": 120},
+        ]
+        data = []
+        for row in get_utilization(from_date, to_date, employee):
+            row.update(efficiency.pop(row.employee, {}))
+            data.append(row)
+        # Hours logged on RO tasks outside the capacity rows (e.g. no employee on the Timesheet)
+        data.extend(efficiency.values())
+    else:
+        options = "Workstation" if group_by == "Workstation" else None
+        columns = [
+            {"label": group_by, "fieldname": GROUP_BY[group_by], "fieldtype": "Link" if options else "Data",
+             "options": options, "width": 200},
+        ]
+        data = list(efficiency.values())
 
-    res = frappe.db.sql(
-        f"""
-        select ts.employee, sum(tl.hours) as logged
-        from `tabTimesheet` ts
-        join `tabTimesheet Detail` tl on tl.parent = ts.name
-        {conditions}
-        group by ts.employee
-        """,
-        params,
-        as_dict=True,
-    )
-
-    # Planned hours approximation from Task planned minutes linked via Timesheet Details if available
-    # If not linkable, consider 8h/day capacity over selected period
-    data = []
-    days = None
-    if from_date and to_date:
-        days = frappe.utils.date_diff(to_date, from_date) + 1
-    for row in res:
-        capacity = (days * 8.0) if days else 40.0
-        planned = capacity
-        logged = float(row.logged or 0)
-        utilization = (logged / capacity * 100.0) if capacity else 0
-        efficiency = utilization  # placeholder; can refine by comparing against planned task-level hours
-        data.append({
-            "employee": row.employee,
-            "planned": planned,
-            "logged": logged,
-            "utilization": utilization,
-            "efficiency": efficiency,
-        })
+    columns += [
+        {"label": "Planned Hours", "fieldname": "planned_hours", "fieldtype": "Float", "width": 120},
+        {"label": "Task Hours", "fieldname": "task_hours", "fieldtype": "Float", "width": 120},
+        {"label": "Efficiency %", "fieldname": "efficiency", "fieldtype": "Percent", "width": 120},
+    ]
 
-    # simple grouped bar style
+    label = GROUP_BY[group_by]
     chart = {
         'data': {
-            'labels': [d['employee'] for d in data],
+            'labels': [d.get(label) or "Not Set" for d in data],
             'datasets': [
-                {'name': 'Utilization %', 'values': [round(d['utilization'], 2) for d in data]},
-                {'name': 'Efficiency %', 'values': [round(d['efficiency'], 2) for d in data]},
-            ]
+                {'name': 'Efficiency %', 'values': [flt(d.get('efficiency'), 2) for d in data]},
+            ] + ([{'name': 'Utilization %', 'values': [flt(d.get('utilization'), 2) for d in data]}]
+                 if group_by == "Technician" else [])
         },
         'type': 'bar'
     }
 
     return columns, data, None, chart
+
+
+def get_efficiency(from_date, to_date, group_by="employee", employee=None):
+    """{group value: {planned_hours, task_hours, efficiency}} for hours logged against RO operation tasks.
+
+    A task's planned minutes are split between technicians in proportion to the
+    hours each logged on it (over the task's whole life), so efficiency is
+    planned hours / logged hours for any grouping.
+    """
+    conditions = ["ts.docstatus = 1", "tl.from_time >= %(from_date)s", "tl.from_time < %(to_date)s"]
+    values = {"from_date": from_date, "to_date": add_days(to_date, 1)}
+    if employee:
+        conditions.append("ts.employee = %(employee)s")
+        values["employee"] = employee
+
+    where = " and ".join(conditions)
+    rows = frappe.db.sql(
+        f"""
+        select x.{group_by} as group_value,
+            sum(x.planned_hours * x.hours / x.total_task_hours) as planned_hours,
+            sum(x.hours) as task_hours
+        from (
+            select ts.employee, op.operation_name, op.workstation,
+                ifnull(op.planned_minutes, 0) / 60 as planned_hours,
+                sum(tl.hours) as hours,
+                task_totals.total_task_hours
+            from `tabTimesheet Detail` tl
+            join `tabTimesheet` ts on ts.name = tl.parent
+            join `tabRepair Operation Line` op on op.task = tl.task and op.parenttype = 'Repair Order'
+            join (
+                -- Lifetime hours of the tasks logged in the period, aggregated once per task
+                select all_tl.task, sum(all_tl.hours) as total_task_hours
+                from `tabTimesheet Detail` all_tl
+                join `tabTimesheet` all_ts on all_ts.name = all_tl.parent
+                where all_ts.docstatus = 1 and all_tl.task in (
+                    select tl.task
+                    from `tabTimesheet Detail` tl
+                    join `tabTimesheet` ts on ts.name = tl.parent
+                    where {where}
+                )
+                group by all_tl.task
+            ) task_totals on task_totals.task = op.task
+            where {where}
+            group by ts.employee, op.name
+        ) x
+        where x.total_task_hours > 0
+        group by x.{group_by}
+        """,
+        values,
+        as_dict=True,
+    )
+    return {
+        row.group_value: frappe._dict({
+            group_by: row.group_value,
+            "planned_hours": flt(row.planned_hours, 2),
+            "task_hours": flt(row.task_hours, 2),
+            "efficiency": flt(row.planned_hours * 100.0 / row.task_hours, 2) if row.task_hours else 0,
+        })
+        for row in rows
+    }
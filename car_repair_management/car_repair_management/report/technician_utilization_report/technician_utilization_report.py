@@ -1,9 +1,13 @@
-import frappe
+from car_repair_management.capacity import get_period, get_utilization
+from car_repair_management.report_cache import get_cached_result
+
 
 def execute(filters=None):
+    return get_cached_result("technician_utilization", filters, _execute)
+
+
+def _execute(filters):
     filters = filters or {}
-    from_date = filters.get('from_date')
-    to_date = filters.get('to_date')
     employee = filters.get('employee')
 
     columns = [
@@ -13,35 +17,15 @@ def execute(filters=None):
         {"label": "Utilization %", "fieldname": "utilization", "fieldtype": "Percent", "width": 120},
     ]
 
-    conditions = " where ts.docstatus = 1 and tl.from_time >= %s and tl.to_time <= %s"
-    params = [from_date, to_date]
-    if employee:
-        conditions += " and tl.employee = %s"
-        params.append(employee)
-
-    res = frappe.db.sql(
-        f"""
-        select tl.employee, sum(tl.hours) as hours
-        from `tabTimesheet` ts
-        join `tabTimesheet Detail` tl on tl.parent = ts.name
-        {conditions}
-        group by tl.employee
-        """,
-        params,
-        as_dict=True,
-    )
-
+    # Capacity from holiday lists and shift assignments, logged hours from submitted Timesheets
+    from_date, to_date = get_period(filters)
     data = []
-    for row in res:
-        # Assume 8 hours/day capacity between range
-        days = frappe.utils.date_diff(to_date, from_date) + 1
-        capacity = days * 8.0
-        utilization = (float(row.hours or 0) / capacity * 100.0) if capacity else 0
+    for row in get_utilization(from_date, to_date, employee):
         data.append({
             "employee": row.employee,
-            "hours": row.hours or 0,
-            "capacity": capacity,
-            "utilization": utilization,
+            "hours": row.logged,
+            "capacity": row.capacity,
+            "utilization": row.utilization,
         })
 
     return columns, data
@@ -1,46 +1,93 @@
 import frappe
-from frappe.utils import nowdate
+from frappe.utils import cint, now
+
+from car_repair_management.report_cache import get_cached_result
+
+# (label, fieldname, upper bound in days; None = open-ended)
+BUCKETS = [
+    ("<=1d", "days_0_1", 1),
+    ("2-3d", "days_2_3", 3),
+    ("4-7d", "days_4_7", 7),
+    ("8-14d", "days_8_14", 14),
+    (">14d", "days_15_plus", None),
+]
+DEFAULT_PAGE_LENGTH = 500
+
+# Open ROs with the days since their last status change (from the status log;
+# ROs without a log row count from creation)
+_AGED_ROS = """
+    select ro.name as repair_order, ro.status, ro.vehicle, ro.sla_delivery_by, ro.owner as advisor,
+        timestampdiff(day, coalesce((
+            select max(l.changed_on) from `tabRepair Order Status Log` l where l.repair_order = ro.name
+        ), ro.creation), %(now)s) as days_in_status
+    from `tabRepair Order` ro
+    where ro.docstatus < 2 and ro.status not in ('Closed', 'Cancelled') {conditions}
+"""
+
 
 def execute(filters=None):
-    today = nowdate()
-    columns = [
-        {"label": "RO ID", "fieldname": "repair_order", "fieldtype": "Link", "options": "Repair Order", "width": 150},
-        {"label": "Status", "fieldname": "status", "fieldtype": "Data", "width": 140},
-        {"label": "Days in Status", "fieldname": "days_in_status", "fieldtype": "Int", "width": 120},
-        {"label": "SLA Due", "fieldname": "sla_delivery_by", "fieldtype": "Datetime", "width": 180},
-        {"label": "Advisor", "fieldname": "advisor", "fieldtype": "Link", "options": "User", "width": 160},
-        {"label": "Vehicle", "fieldname": "vehicle", "fieldtype": "Link", "options": "Vehicle", "width": 160},
-    ]
+    return get_cached_result("wip_aging", filters, _execute)
 
-    # Approximate days in status using last modified timestamp since last_status_change is not tracked
-    rows = frappe.db.sql(
-        """
-        select name as repair_order, status, vehicle, sla_delivery_by,
-               TIMESTAMPDIFF(DAY, modified, %(today)s) as days_in_status,
-               owner as advisor
-        from `tabRepair Order`
-        where status not in ('Closed', 'Cancelled')
+
+def _execute(filters):
+    filters = filters or {}
+    conditions, values = "", {"now": now()}
+    if filters.get("status"):
+        conditions, values["status"] = "and ro.status = %(status)s", filters.get("status")
+    aged = _AGED_ROS.format(conditions=conditions)
+
+    # Days-in-status buckets per status in one grouped query
+    bucket_case = "case " + " ".join(
+        f"when days_in_status <= {upper} then '{fieldname}'" for _label, fieldname, upper in BUCKETS if upper
+    ) + f" else '{BUCKETS[-1][1]}' end"
+    summary = frappe.db.sql(
+        f"""
+        select status, count(*) as ros, round(avg(days_in_status), 1) as avg_days,
+            max(days_in_status) as max_days,
+            {", ".join(f"sum(bucket = '{fieldname}') as {fieldname}" for _label, fieldname, _upper in BUCKETS)}
+        from (select a.*, {bucket_case} as bucket from ({aged}) a) t
+        group by status
+        order by max(days_in_status) desc
         """,
-        {"today": today}, as_dict=True
+        values,
+        as_dict=True,
     )
 
-    data = list(rows)
-
-    # histogram-like chart buckets
-    buckets = [0,0,0,0,0]
-    for r in data:
-        d = int(r.days_in_status or 0)
-        if d <= 1: buckets[0]+=1
-        elif d <=3: buckets[1]+=1
-        elif d <=7: buckets[2]+=1
-        elif d <=14: buckets[3]+=1
-        else: buckets[4]+=1
     chart = {
         'data': {
-            'labels': ['<=1d','2-3d','4-7d','8-14d','>14d'],
-            'datasets': [{'name': 'ROs', 'values': buckets}]
+            'labels': [label for label, _fieldname, _upper in BUCKETS],
+            'datasets': [{'name': 'ROs', 'values': [sum(cint(r[fieldname]) for r in summary)
+                                                    for _label, fieldname, _upper in BUCKETS]}]
         },
         'type': 'bar'
     }
 
+    if filters.get("show_summary"):
+        columns = [
+            {"label": "Status", "fieldname": "status", "fieldtype": "Data", "width": 160},
+            {"label": "ROs", "fieldname": "ros", "fieldtype": "Int", "width": 80},
+            {"label": "Avg Days", "fieldname": "avg_days", "fieldtype": "Float", "width": 100},
+            {"label": "Max Days", "fieldname": "max_days", "fieldtype": "Int", "width": 100},
+        ] + [
+            {"label": label, "fieldname": fieldname, "fieldtype": "Int", "width": 80}
+            for label, fieldname, _upper in BUCKETS
+        ]
+        return columns, summary, None, chart
+
+    columns = [
+        {"label": "RO ID", "fieldname": "repair_order", "fieldtype": "Link", "options": "Repair Order", "width": 150},
+        {"label": "Status", "fieldname": "status", "fieldtype": "Data", "width": 140},
+        {"label": "Days in Status", "fieldname": "days_in_status", "fieldtype": "Int", "width": 120},
+        {"label": "SLA Due", "fieldname": "sla_delivery_by", "fieldtype": "Datetime", "width": 180},
+        {"label": "Advisor", "fieldname": "advisor", "fieldtype": "Link", "options": "User", "width": 160},
+        {"label": "Vehicle", "fieldname": "vehicle", "fieldtype": "Link", "options": "Vehicle", "width": 160},
+    ]
+    page_length = cint(filters.get("page_length")) or DEFAULT_PAGE_LENGTH
+    page = max(cint(filters.get("page")), 1)
+    values.update(limit=page_length, offset=(page - 1) * page_length)
+    data = frappe.db.sql(
+        f"{aged} order by days_in_status desc, ro.name limit %(limit)s offset %(offset)s",
+        values,
+        as_dict=True,
+    )
     return columns, data, None, chart
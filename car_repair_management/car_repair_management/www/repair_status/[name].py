@@ -1,13 +1,14 @@
 import frappe
 
+from car_repair_management.repair_status import get_portal_context
+
+
 def get_context(context):
     name = frappe.form_dict.get('name') or context.get('name')
-    ro = frappe.get_doc('Repair Order', name)
-    tasks = []
-    if ro.project:
-        tasks = frappe.get_all('Task', filters={'project': ro.project}, fields=['name','subject','status','exp_start_date','exp_end_date'])
-    updates = [d for d in ro.customer_updates if d.visible_on_portal]
-    context.repair_order = ro
-    context.tasks = tasks
-    context.updates = updates
+    portal = get_portal_context(name)
+    if not portal:
+        raise frappe.DoesNotExistError(f"Repair Order {name} not found")
+    # Cached per Repair Order by car_repair_management.repair_status.RepairStatusPage
+    context.no_cache = 1
+    context.update(portal)
     return context
@@ -23,14 +23,53 @@ doctype_js = {
 doc_events = {
     "Repair Order": {
         "validate": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.on_validate",
-        "on_submit": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.on_submit",
+        "after_insert": "car_repair_management.car_repair_management.doctype.vehicle_repair_order_daily.vehicle_repair_order_daily.on_repair_order_insert",
+        "on_trash": [
+            "car_repair_management.car_repair_management.doctype.vehicle_repair_order_daily.vehicle_repair_order_daily.on_repair_order_trash",
+            "car_repair_management.repair_status.on_repair_order_change",
+            "car_repair_management.car_repair_management.doctype.repair_order_status_log.repair_order_status_log.delete_status_logs",
+            "car_repair_management.car_repair_management.doctype.job_costing_history.job_costing_history.delete_cost_history",
+            "car_repair_management.report_cache.invalidate_deleted",
+        ],
+        "on_submit": [
+            "car_repair_management.car_repair_management.doctype.repair_order.repair_order.on_submit",
+            "car_repair_management.vehicle_rollups.on_repair_order_submit",
+        ],
+        "on_cancel": [
+            "car_repair_management.car_repair_management.doctype.repair_order.repair_order.on_cancel",
+            "car_repair_management.vehicle_rollups.on_repair_order_cancel",
+            "car_repair_management.car_repair_management.doctype.vehicle_repair_order_daily.vehicle_repair_order_daily.on_repair_order_cancel",
+            "car_repair_management.report_cache.invalidate_report_cache",
+            "car_repair_management.repair_status.on_repair_order_change",
+            "car_repair_management.car_repair_management.doctype.repair_order.task_routing.on_repair_order_change",
+        ],
         "before_update_after_submit": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.before_update_after_submit",
         "before_save": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.before_save",
         "after_save": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.after_save",
+        "on_update": [
+            "car_repair_management.car_repair_management.doctype.repair_order_status_log.repair_order_status_log.record_status_change",
+            "car_repair_management.car_repair_management.doctype.vehicle_repair_order_daily.vehicle_repair_order_daily.on_repair_order_update",
+            "car_repair_management.report_cache.invalidate_report_cache",
+            "car_repair_management.repair_status.on_repair_order_change",
+            "car_repair_management.repair_status.publish_repair_order_change",
+        ],
+        "on_update_after_submit": [
+            "car_repair_management.car_repair_management.doctype.repair_order_status_log.repair_order_status_log.record_status_change",
+            "car_repair_management.report_cache.invalidate_report_cache",
+            "car_repair_management.repair_status.on_repair_order_change",
+            "car_repair_management.repair_status.publish_repair_order_change",
+            "car_repair_management.car_repair_management.doctype.repair_order.task_routing.on_repair_order_change",
+        ],
     },
     "Timesheet": {
-        "on_submit": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_timesheet",
-        "on_cancel": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_timesheet",
+        "on_submit": [
+            "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_timesheet",
+            "car_repair_management.report_cache.invalidate_report_cache",
+        ],
+        "on_cancel": [
+            "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_timesheet",
+            "car_repair_management.report_cache.invalidate_report_cache",
+        ],
     },
     "Purchase Invoice": {
         "on_submit": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_purchase_invoice",
@@ -48,11 +87,40 @@ doc_events = {
         "on_submit": [
             "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_sales_invoice",
             "car_repair_management.car_repair_management.doctype.repair_order.auto_status.update_ro_status_from_sales_invoice",
+            "car_repair_management.vehicle_rollups.on_sales_invoice_change",
+            "car_repair_management.report_cache.invalidate_report_cache",
+        ],
+        "on_cancel": [
+            "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_sales_invoice",
+            "car_repair_management.vehicle_rollups.on_sales_invoice_change",
+            "car_repair_management.report_cache.invalidate_report_cache",
+        ],
+    },
+    "Stock Entry": {
+        "before_submit": "car_repair_management.car_repair_management.doctype.parts_consumption_daily.parts_consumption_daily.stamp_billable_flags",
+        "on_submit": [
+            "car_repair_management.car_repair_management.doctype.parts_consumption_daily.parts_consumption_daily.update_parts_consumption",
+            "car_repair_management.report_cache.invalidate_report_cache",
+        ],
+        "on_cancel": [
+            "car_repair_management.car_repair_management.doctype.parts_consumption_daily.parts_consumption_daily.update_parts_consumption",
+            "car_repair_management.report_cache.invalidate_report_cache",
         ],
-        "on_cancel": "car_repair_management.car_repair_management.doctype.repair_order.repair_order.update_ro_from_sales_invoice",
     },
     "Task": {
-        "on_update": "car_repair_management.car_repair_management.doctype.repair_order.auto_status.update_ro_status_from_task",
+        "on_update": [
+            "car_repair_management.car_repair_management.doctype.repair_order.auto_status.update_ro_status_from_task",
+            "car_repair_management.repair_status.on_task_change",
+        ],
+        "on_trash": [
+            "car_repair_management.repair_status.on_task_change",
+            "car_repair_management.car_repair_management.doctype.repair_order.task_routing.on_task_trash",
+        ],
+    },
+    "Customer Update": {
+        "after_insert": "car_repair_management.repair_status.publish_customer_update",
+        "on_update": "car_repair_management.repair_status.on_customer_update_change",
+        "on_trash": "car_repair_management.repair_status.on_customer_update_change",
     },
 }
 
@@ -64,9 +132,19 @@ override_whitelisted_methods = {
 
 # Scheduler
 scheduler_events = {
+    "hourly": [
+        "car_repair_management.car_repair_management.doctype.repair_order.task_routing.reconcile_task_counters",
+        "car_repair_management.sharding.requeue_stale_shards",
+    ],
     "daily": [
-        "car_repair_management.tasks.update_job_costing_snapshots"
-    ]
+        "car_repair_management.tasks.update_job_costing_snapshots",
+        "car_repair_management.service_due.update_next_service_due_dates",
+    ],
+    "cron": {
+        "* * * * *": [
+            "car_repair_management.car_repair_management.doctype.repair_order.recompute_queue.sweep_pending_recomputes",
+        ],
+    },
 }
 
 # Installation hooks
@@ -88,3 +166,6 @@ override_doctype_dashboards = {
     "Vehicle": "car_repair_management.overrides.vehicle_dashboard.get_data"
 }
 
+# Conditional GET and per-RO page cache for the /repair_status/<name> portal page
+page_renderer = ["car_repair_management.repair_status.RepairStatusPage"]
+
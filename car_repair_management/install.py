@@ -15,7 +15,7 @@ def create_customizations():
             dict(fieldname="transmission", label="Transmission", fieldtype="Select", options="Manual\nAutomatic\nCVT", insert_after="year"),
             dict(fieldname="odometer_at_last_service", label="Odometer at Last Service", fieldtype="Int", insert_after="transmission"),
             dict(fieldname="last_service_date", label="Last Service Date", fieldtype="Date", insert_after="odometer_at_last_service", read_only=1),
-            dict(fieldname="next_service_due_date", label="Next Service Due Date", fieldtype="Date", insert_after="last_service_date", read_only=1),
+            dict(fieldname="next_service_due_date", label="Next Service Due Date", fieldtype="Date", insert_after="last_service_date", read_only=1, in_list_view=1, in_standard_filter=1, search_index=1),
             dict(fieldname="jobs_count", label="Jobs Count", fieldtype="Int", insert_after="next_service_due_date", read_only=1),
             dict(fieldname="repair_cost_to_date", label="Repair Cost To Date", fieldtype="Currency", insert_after="jobs_count", read_only=1),
             dict(fieldname="revenue_billed_to_date", label="Revenue Billed To Date", fieldtype="Currency", insert_after="repair_cost_to_date", read_only=1),
@@ -53,6 +53,9 @@ def create_customizations():
         "Stock Entry": [
             dict(fieldname="repair_order", label="Repair Order", fieldtype="Link", options="Repair Order", insert_after="company", hidden=1),
         ],
+        "Stock Entry Detail": [
+            dict(fieldname="is_billable", label="Billable (Repair Order)", fieldtype="Check", insert_after="item_code", hidden=1, read_only=1, no_copy=1),
+        ],
         "Purchase Invoice": [
             dict(fieldname="repair_order", label="Repair Order", fieldtype="Link", options="Repair Order", insert_after="company", hidden=1),
         ],
@@ -61,6 +64,9 @@ def create_customizations():
     # Idempotent creation
     create_custom_fields(custom_fields, ignore_validate=True)
 
+    # Indexes for the Repair Order link columns (patches are skipped on fresh installs)
+    _create_indexes()
+
     # Create Workspace assets (Number Cards, Charts, Workspace, Kanban)
     try:
         _create_kpis_and_charts()
@@ -76,6 +82,46 @@ def create_customizations():
         frappe.log_error(frappe.get_traceback(), "Car Repair Management: Vehicle dashboard links")
 
 
+# (doctype, columns, index name) matching the filters used by cost hooks, reports and cards
+REPAIR_ORDER_INDEXES = [
+    ("Timesheet", ["repair_order", "docstatus"], "repair_order_docstatus_index"),
+    ("Timesheet Detail", ["task"], "task_index"),
+    ("Timesheet Detail", ["project"], "project_index"),
+    ("Timesheet Detail", ["from_time"], "from_time_index"),
+    ("Repair Operation Line", ["task"], "task_index"),
+    ("Task", ["repair_order", "status"], "repair_order_status_index"),
+    ("Project", ["repair_order"], "repair_order_index"),
+    ("Stock Entry", ["repair_order", "docstatus"], "repair_order_docstatus_index"),
+    ("Purchase Invoice", ["repair_order", "docstatus"], "repair_order_docstatus_index"),
+    ("Quotation", ["custom_repair_order", "docstatus"], "custom_repair_order_docstatus_index"),
+    ("Sales Order", ["custom_repair_order", "docstatus"], "custom_repair_order_docstatus_index"),
+    ("Sales Invoice", ["custom_repair_order", "docstatus"], "custom_repair_order_docstatus_index"),
+    ("Quotation Item", ["repair_order"], "repair_order_index"),
+    ("Sales Order Item", ["repair_order"], "repair_order_index"),
+    ("Sales Invoice Item", ["repair_order"], "repair_order_index"),
+    ("Repair Order", ["status", "sla_delivery_by"], "status_sla_delivery_by_index"),
+    ("Repair Order", ["vehicle", "creation"], "vehicle_creation_index"),
+    ("Repair Order", ["customer", "modified"], "customer_modified_index"),
+    ("Repair Cost Ledger Entry", ["repair_order", "cost_type"], "repair_order_cost_type_index"),
+    ("Repair Cost Ledger Entry", ["voucher_type", "voucher_no"], "voucher_index"),
+    ("Job Costing History", ["repair_order", "snapshot_date"], "repair_order_snapshot_date_index"),
+    ("Repair Order Status Log", ["repair_order", "changed_on"], "repair_order_changed_on_index"),
+    ("Vehicle", ["repair_cost_to_date"], "repair_cost_to_date_index"),
+    ("Vehicle Repair Order Daily", ["vehicle", "creation_date"], "vehicle_creation_date_index"),
+    ("Vehicle Log", ["license_plate", "date"], "license_plate_date_index"),
+]
+
+
+def _create_indexes():
+    """Add the composite indexes in REPAIR_ORDER_INDEXES (idempotent)."""
+    for doctype, columns, index_name in REPAIR_ORDER_INDEXES:
+        if not frappe.db.table_exists(doctype):
+            continue
+        if not all(frappe.db.has_column(doctype, column) for column in columns):
+            continue
+        frappe.db.add_index(doctype, columns, index_name)
+
+
 def _create_kpis_and_charts():
     """Create Number Cards and Dashboard Charts for the Workshop workspace (idempotent)."""
     module = "Car Repair Management"
@@ -172,14 +218,17 @@ def _create_kpis_and_charts():
         filters_json=filters_json,
     )
 
-    # Parts Billable vs FoC (30 days) - from report chart
+    # Parts Billable vs FoC (30 days) - from report chart, window evaluated client-side
     upsert_dashboard_chart(
         name="Billable vs FoC Parts (30d)",
         chart_type="Report",
         report_name="Parts Consumption Billable vs FoC",
         use_report_chart=1,
         type="Pie",
-        filters_json=frappe.as_json([]),
+        filters_json=frappe.as_json({}),
+        dynamic_filters_json=frappe.as_json({
+            "from_date": "frappe.datetime.add_days(frappe.datetime.get_today(), -30)",
+        }),
     )
     
     # Most Repaired Vehicles (Top 10)
@@ -399,6 +448,8 @@ def _ensure_kanban_board():
         "Scheduled",
         "In Progress",
         "Awaiting Parts",
+        "Completed",
+        "Invoiced",
         "Ready for Handover",
         "Delivered",
         "Closed",
@@ -2,9 +2,15 @@
 
 import frappe
 from frappe import _
-from frappe.query_builder.functions import Count, CurDate, Date, UnixTimestamp
+from frappe.query_builder.functions import CurDate, UnixTimestamp
 from frappe.query_builder import Interval
 
+from car_repair_management.car_repair_management.doctype.vehicle_repair_order_daily.vehicle_repair_order_daily import (
+	HEATMAP_CACHE_KEY,
+)
+
+HEATMAP_CACHE_TTL = 300
+
 
 def get_data(data=None):
 	"""
@@ -44,19 +50,26 @@ def get_data(data=None):
 
 @frappe.whitelist()
 def get_timeline_data(doctype, name):
-	"""Return timeline data for Repair Orders created for this vehicle."""
-	
-	repair_order = frappe.qb.DocType("Repair Order")
-	
-	# Get RO creation dates for the past year
+	"""Return timeline data for Repair Orders created for this vehicle.
+
+	Reads the pre-counted Vehicle Repair Order Daily rollup and caches the
+	result briefly, since the heatmap is requested on every Vehicle form load.
+	"""
+	key = HEATMAP_CACHE_KEY.format(name)
+	timeline_data = frappe.cache.get_value(key)
+	if timeline_data is not None:
+		return timeline_data
+
+	daily = frappe.qb.DocType("Vehicle Repair Order Daily")
+
+	# Pre-counted RO creation days for the past year
 	timeline_data = dict(
-		frappe.qb.from_(repair_order)
-		.select(UnixTimestamp(repair_order.creation), Count("*"))
-		.where(repair_order.vehicle == name)
-		.where(repair_order.creation > CurDate() - Interval(years=1))
-		.where(repair_order.docstatus < 2)
-		.groupby(Date(repair_order.creation))
+		frappe.qb.from_(daily)
+		.select(UnixTimestamp(daily.creation_date), daily.repair_orders)
+		.where(daily.vehicle == name)
+		.where(daily.creation_date > CurDate() - Interval(years=1))
 		.run()
 	)
-	
+
+	frappe.cache.set_value(key, timeline_data, expires_in_sec=HEATMAP_CACHE_TTL)
 	return timeline_data
@@ -0,0 +1,5 @@
+from car_repair_management.install import _create_indexes
+
+
+def execute():
+    _create_indexes()
@@ -0,0 +1,23 @@
+import frappe
+from frappe.utils import now
+
+
+def execute():
+    """Seed one status log row per existing RO so aging has a starting point.
+
+    The last modification is the best available guess for when the current
+    status was set.
+    """
+    frappe.db.sql(
+        """
+        insert into `tabRepair Order Status Log`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             repair_order, status, changed_on, changed_by)
+        select md5(concat(ro.name, '|', ro.status)), %(now)s, %(now)s, 'Administrator', 'Administrator', 0, 0,
+            ro.name, ro.status, ro.modified, ro.modified_by
+        from `tabRepair Order` ro
+        left join `tabRepair Order Status Log` l on l.repair_order = ro.name
+        where l.name is null and ifnull(ro.status, '') != ''
+        """,
+        {"now": now()},
+    )
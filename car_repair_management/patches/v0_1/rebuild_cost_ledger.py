@@ -0,0 +1,5 @@
+from car_repair_management.car_repair_management.doctype.repair_order.cost_ledger import rebuild_cost_ledger
+
+
+def execute():
+    rebuild_cost_ledger()
@@ -0,0 +1,7 @@
+from car_repair_management.car_repair_management.doctype.parts_consumption_daily.parts_consumption_daily import (
+    rebuild_parts_consumption,
+)
+
+
+def execute():
+    rebuild_parts_consumption()
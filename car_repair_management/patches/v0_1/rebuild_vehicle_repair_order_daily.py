@@ -0,0 +1,7 @@
+from car_repair_management.car_repair_management.doctype.vehicle_repair_order_daily.vehicle_repair_order_daily import (
+    rebuild_vehicle_repair_order_daily,
+)
+
+
+def execute():
+    rebuild_vehicle_repair_order_daily()
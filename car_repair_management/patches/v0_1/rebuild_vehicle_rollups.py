@@ -0,0 +1,5 @@
+from car_repair_management.vehicle_rollups import recompute_vehicle_rollups
+
+
+def execute():
+    recompute_vehicle_rollups()
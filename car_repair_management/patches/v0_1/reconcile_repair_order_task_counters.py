@@ -0,0 +1,7 @@
+from car_repair_management.car_repair_management.doctype.repair_order.task_routing import (
+    reconcile_task_counters,
+)
+
+
+def execute():
+    reconcile_task_counters()
@@ -0,0 +1,31 @@
+import frappe
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from car_repair_management.car_repair_management.doctype.parts_consumption_daily.parts_consumption_daily import (
+    rebuild_parts_consumption,
+)
+
+
+def execute():
+    # Fixtures are synced after patches; the rollup rebuild needs the column now
+    create_custom_fields({
+        "Stock Entry Detail": [
+            dict(fieldname="is_billable", label="Billable (Repair Order)", fieldtype="Check", insert_after="item_code", hidden=1, read_only=1, no_copy=1),
+        ],
+    }, ignore_validate=True)
+
+    frappe.db.sql(
+        """
+        update `tabStock Entry Detail` sed
+        join `tabStock Entry` se on se.name = sed.parent
+        left join (
+            select parent, item_code, max(case when is_billable = 1 then 1 else 0 end) as is_billable
+            from `tabRepair Parts Plan`
+            where parenttype = 'Repair Order'
+            group by parent, item_code
+        ) plan on plan.parent = se.repair_order and plan.item_code = sed.item_code
+        set sed.is_billable = ifnull(plan.is_billable, 1)
+        where se.docstatus = 1 and ifnull(se.repair_order, '') != ''
+        """
+    )
+    rebuild_parts_consumption()
@@ -0,0 +1,68 @@
+"""EXPLAIN-based check that the app's hot queries can use an index.
+
+bench --site <site> execute car_repair_management.query_plans.check_query_plans
+"""
+import frappe
+
+PLAN_CHECK_RO = "RO-PLAN-CHECK"
+
+
+def get_shipped_queries():
+    """[(label, query, params)] built by the same code that issues them.
+
+    Queries that read a whole table by design (unfiltered exports, rebuilds)
+    are left out: a scan is the right plan for them.
+    """
+    from car_repair_management.car_repair_management.doctype.repair_order import cost_ledger
+    from car_repair_management.car_repair_management.doctype.repair_order.status_machine import (
+        GUARDS,
+        get_guards_query,
+    )
+    from car_repair_management.car_repair_management.report.job_profitability_report.job_profitability_report import (
+        get_export_query,
+    )
+    from car_repair_management.repair_status import _get_repair_statuses
+
+    guard_params = {"name": PLAN_CHECK_RO, "sales_invoice": "SINV-PLAN-CHECK"}
+    _columns, profitability_query, profitability_params = get_export_query({"customer": "CUST-PLAN-CHECK"})
+    bulk_status_query = _get_repair_statuses(
+        [["docstatus", "<", 2], ["customer", "=", "CUST-PLAN-CHECK"], ["modified", ">=", "2000-01-01"]],
+        run=False,
+    )
+    return [
+        ("cost ledger totals", cost_ledger.TOTALS_QUERY, (PLAN_CHECK_RO,)),
+        ("cost ledger reversal", cost_ledger.REVERSAL_QUERY, ("Timesheet", "TS-PLAN-CHECK")),
+        *((f"status guard {guard}", get_guards_query([guard]), guard_params) for guard in GUARDS),
+        ("job profitability by customer", profitability_query, profitability_params),
+        # Built with values inlined by get_list
+        ("bulk status lookup", bulk_status_query, ()),
+    ]
+
+
+def get_full_scans():
+    """Return [(label, table)] for queries whose plan scans a table with no usable index.
+
+    A plan row with `type = ALL` and no `possible_keys` means no index matches the
+    filter at all. ALL with candidate keys is accepted: on small tables the
+    optimizer may prefer a scan even though the index exists.
+    """
+    if frappe.db.db_type != "mariadb":
+        return []
+
+    offenders = []
+    for label, query, params in get_shipped_queries():
+        for row in frappe.db.sql("explain " + query, params, as_dict=True):
+            if (row.get("type") or "").upper() == "ALL" and not row.get("possible_keys"):
+                offenders.append((label, row.get("table")))
+    return offenders
+
+
+def check_query_plans():
+    """Raise if any shipped query falls back to a full table scan."""
+    offenders = get_full_scans()
+    if offenders:
+        frappe.throw(
+            "Full table scan in: " + ", ".join(f"{label} ({table})" for label, table in offenders),
+            title="Missing index",
+        )
+    return "OK"
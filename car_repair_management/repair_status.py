@@ -0,0 +1,264 @@
+"""Customer portal page /repair_status/<name>.
+
+The page context is a narrow projection of the Repair Order, its project's
+Tasks and its portal-visible Customer Updates (filtered in SQL). Guest renders
+are cached per Repair Order together with an ETag and Last-Modified stamp, so
+repeated refreshes either get a 304 or the cached HTML without touching the
+database. Pages of logged-in users carry their navbar and session data and
+are rendered fresh, like Frappe's own page cache does. Repair Order, Task and
+Customer Update changes drop the cached page once their transaction commits.
+
+Status changes and new portal-visible Customer Updates are also pushed as
+compact `repair_order_status` realtime events to the RO's document room (the
+RO form), to the Repair Order doctype room (the WIP Kanban board) and to the
+RO's portal room, so open pages update in place instead of reloading. Guests
+cannot join document rooms, so the portal page joins a task room named by a
+token derived from the RO name and the site's encryption key; only pages
+rendered for the RO know it.
+
+Fleet integrations poll `get_repair_statuses` for many ROs at once: one
+projected, permission-checked query. Full lookups are cached briefly; polls
+with a (modified, name) cursor only return ROs after it and always hit the
+database.
+"""
+import hashlib
+import hmac
+import json
+from zoneinfo import ZoneInfo
+
+import frappe
+from frappe.realtime import get_doctype_room
+from frappe.utils import cint, get_datetime, get_system_timezone
+from frappe.utils.password import get_encryption_key
+from frappe.website.page_renderers.template_page import TemplatePage
+from werkzeug.http import http_date
+
+ROUTE = "repair_status"
+STATUS_EVENT = "repair_order_status"
+PAGE_CACHE_KEY = "repair_status::page::{}"
+PAGE_CACHE_TTL = 24 * 60 * 60
+
+STATUS_GENERATION_KEY = "repair_status::generation"
+DEFAULT_STATUS_CACHE_TTL = 60
+MAX_BULK_LOOKUP = 1000
+# Between the modified timestamp and the name of the last RO in a bulk lookup cursor
+CURSOR_SEPARATOR = "|"
+
+BULK_STATUS_FIELDS = (
+    "name", "vehicle", "customer", "status", "docstatus", "modified",
+    "sla_response_by", "sla_delivery_by", "quoted_amount", "invoiced_amount", "total_job_cost",
+)
+
+PORTAL_FIELDS = (
+    "name", "status", "customer", "vehicle", "project", "modified",
+    "sla_response_by", "sla_delivery_by", "quoted_amount", "invoiced_amount", "total_job_cost",
+)
+
+
+def get_portal_context(name):
+    """Projected page context for one Repair Order; None if it does not exist."""
+    repair_order = frappe.db.get_value("Repair Order", name, PORTAL_FIELDS, as_dict=True)
+    if not repair_order:
+        return None
+
+    tasks = []
+    if repair_order.project:
+        tasks = frappe.get_all(
+            "Task",
+            filters={"project": repair_order.project},
+            fields=["name", "subject", "status", "exp_start_date", "exp_end_date", "modified"],
+        )
+    updates = frappe.get_all(
+        "Customer Update",
+        filters={"parent": name, "parenttype": "Repair Order", "visible_on_portal": 1},
+        fields=["update_type", "message", "modified"],
+        order_by="idx",
+    )
+    return frappe._dict(
+        repair_order=repair_order,
+        tasks=tasks,
+        updates=updates,
+        portal_room=get_portal_room(name),
+        last_modified=max([repair_order.modified] + [d.modified for d in tasks + updates]),
+    )
+
+
+@frappe.whitelist()
+def get_repair_statuses(repair_orders=None, vehicles=None, customer=None, since=None):
+    """Status, SLA dates and cost summary of many Repair Orders in one call.
+
+    Select by RO names, vehicles and/or a customer (combined with AND). With
+    `since` (the `cursor` of a previous call) only ROs after it in (modified,
+    name) order are returned, so ROs sharing the cursor's timestamp are not
+    skipped. Returns {"cursor": ..., "repair_orders": [...]}.
+    """
+    repair_orders = frappe.parse_json(repair_orders) if isinstance(repair_orders, str) else repair_orders
+    vehicles = frappe.parse_json(vehicles) if isinstance(vehicles, str) else vehicles
+    if not (repair_orders or vehicles or customer):
+        frappe.throw("Pass repair_orders, vehicles or a customer")
+    if len(repair_orders or []) > MAX_BULK_LOOKUP or len(vehicles or []) > MAX_BULK_LOOKUP:
+        frappe.throw(f"At most {MAX_BULK_LOOKUP} Repair Orders or vehicles per call")
+
+    filters = [["docstatus", "<", 2]]
+    if repair_orders:
+        filters.append(["name", "in", repair_orders])
+    if vehicles:
+        filters.append(["vehicle", "in", vehicles])
+    if customer:
+        filters.append(["customer", "=", customer])
+
+    if since:
+        # Polls are answered from the database: a cached answer could hand out a cursor
+        # that already skipped ROs committed since it was cached
+        return _repair_statuses_since(filters, since)
+
+    # Results are per user: get_list applies their permissions
+    key = "repair_status::bulk::{}::{}".format(
+        frappe.cache.get_value(STATUS_GENERATION_KEY) or "0",
+        hashlib.md5(json.dumps([frappe.session.user, filters], sort_keys=True, default=str).encode()).hexdigest(),
+    )
+    result = frappe.cache.get_value(key)
+    if result is None:
+        rows = _get_repair_statuses(filters)
+        result = {"cursor": _cursor(rows[-1]) if rows else None, "repair_orders": rows}
+        ttl = cint(frappe.conf.get("repair_status_cache_ttl")) or DEFAULT_STATUS_CACHE_TTL
+        frappe.cache.set_value(key, result, expires_in_sec=ttl)
+    return result
+
+
+def _repair_statuses_since(filters, since):
+    # A bare timestamp (cursor of older versions) sorts before every name at that time
+    modified, _, name = since.partition(CURSOR_SEPARATOR)
+    modified = get_datetime(modified)
+    rows = [
+        row
+        for row in _get_repair_statuses(filters + [["modified", ">=", modified]])
+        if (row.modified, row.name) > (modified, name)
+    ]
+    return {"cursor": _cursor(rows[-1]) if rows else since, "repair_orders": rows}
+
+
+def _get_repair_statuses(filters, run=True):
+    # run=False returns the SQL instead, for query_plans
+    return frappe.get_list(
+        "Repair Order", filters=filters, fields=BULK_STATUS_FIELDS, order_by="modified asc, name asc", run=run
+    )
+
+
+def _cursor(row):
+    return f"{row.modified}{CURSOR_SEPARATOR}{row.name}"
+
+
+class RepairStatusPage(TemplatePage):
+    """Serves /repair_status/<name> to Guests from the per-RO page cache with conditional GET support."""
+
+    def can_render(self):
+        return self.path.startswith(f"{ROUTE}/") and super().can_render()
+
+    def render(self):
+        # The HTML of a logged-in user's page is theirs alone
+        if frappe.session.user != "Guest":
+            return super().render()
+
+        # Set by the path resolver from the [name] route, the same value get_context reads
+        name = frappe.form_dict.get("name")
+        if not name:
+            return super().render()
+
+        key = PAGE_CACHE_KEY.format(name)
+        page = frappe.cache.get_value(key)
+        if page is None:
+            html = self.get_html()
+            page = {
+                "html": html,
+                "etag": hashlib.md5(html.encode()).hexdigest(),
+                "last_modified": _timestamp(self.context.last_modified),
+            }
+            frappe.cache.set_value(key, page, expires_in_sec=PAGE_CACHE_TTL)
+
+        headers = {
+            "ETag": f'"{page["etag"]}"',
+            "Last-Modified": http_date(page["last_modified"]),
+            "Cache-Control": "private, no-cache",
+        }
+        if _not_modified(page):
+            return self.build_response("", http_status_code=304, headers=headers)
+        # The CSRF token is per session, so it is added after the cached render
+        return self.build_response(self.add_csrf_token(page["html"]), headers=headers)
+
+
+def _not_modified(page):
+    request = frappe.request
+    if request.if_none_match:
+        return request.if_none_match.contains(page["etag"])
+    if request.if_modified_since:
+        return request.if_modified_since.timestamp() >= int(page["last_modified"])
+    return False
+
+
+def _timestamp(value):
+    return get_datetime(value).replace(tzinfo=ZoneInfo(get_system_timezone())).timestamp()
+
+
+def clear_repair_status_cache(repair_order):
+    """Drop the cached portal page of `repair_order` and all bulk lookups once the transaction commits."""
+    if repair_order:
+        frappe.db.after_commit.add(lambda: _clear_repair_status_cache(repair_order))
+
+
+def _clear_repair_status_cache(repair_order):
+    frappe.cache.delete_value(PAGE_CACHE_KEY.format(repair_order))
+    frappe.cache.set_value(STATUS_GENERATION_KEY, frappe.generate_hash(length=10))
+
+
+def get_portal_room(repair_order):
+    """Non-guessable task room id the portal page of `repair_order` subscribes to."""
+    return hmac.new(get_encryption_key().encode(), f"{ROUTE}:{repair_order}".encode(), hashlib.sha256).hexdigest()
+
+
+def publish_status_event(repair_order, status, updates=None):
+    """Push {name, status, updates} to the RO's document and portal rooms and the doctype room after commit."""
+    message = {"name": repair_order, "status": status, "updates": updates or []}
+    frappe.publish_realtime(STATUS_EVENT, message, doctype="Repair Order", docname=repair_order, after_commit=True)
+    # Task rooms can be joined without a permission check, which is what lets Guests in
+    frappe.publish_realtime(STATUS_EVENT, message, task_id=get_portal_room(repair_order), after_commit=True)
+    frappe.publish_realtime(STATUS_EVENT, message, room=get_doctype_room("Repair Order"), after_commit=True)
+
+
+def on_repair_order_change(doc, method=None):
+    clear_repair_status_cache(doc.name)
+
+
+def publish_repair_order_change(doc, method=None):
+    """Repair Order on_update / on_update_after_submit: publish a status change or new portal updates."""
+    before = doc.get_doc_before_save()
+    if not before:
+        return
+    known = {d.name for d in before.get("customer_updates")}
+    updates = [
+        {"update_type": d.update_type, "message": d.message}
+        for d in doc.get("customer_updates") if d.visible_on_portal and d.name not in known
+    ]
+    if updates or before.status != doc.status:
+        publish_status_event(doc.name, doc.status, updates)
+
+
+def on_task_change(doc, method=None):
+    repair_order = doc.get("repair_order")
+    if not repair_order and doc.project:
+        repair_order = frappe.db.get_value("Repair Order", {"project": doc.project})
+    clear_repair_status_cache(repair_order)
+
+
+def on_customer_update_change(doc, method=None):
+    # Rows saved through the Repair Order are covered by its own events;
+    # this catches rows inserted or edited on their own
+    if doc.parenttype == "Repair Order":
+        clear_repair_status_cache(doc.parent)
+
+
+def publish_customer_update(doc, method=None):
+    """Customer Update after_insert: push rows inserted on their own to the portal."""
+    if doc.parenttype == "Repair Order" and doc.visible_on_portal:
+        status = frappe.db.get_value("Repair Order", doc.parent, "status")
+        publish_status_event(doc.parent, status, [{"update_type": doc.update_type, "message": doc.message}])
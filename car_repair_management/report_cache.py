@@ -0,0 +1,162 @@
+"""Shared result cache for the car repair script reports.
+
+Reports call `get_cached_result(report, filters, compute)`. Results are kept in
+Redis under the report, its normalized filters and a per-report generation
+token, for `report_cache_ttl` seconds (site config, default 600). Bumping the
+token on the doc events of the source doctypes invalidates every cached
+filter combination of the affected reports at once. A save only invalidates
+the reports that read one of the fields it changed, and the tokens are bumped
+once per transaction, after it commits.
+
+Hit and miss counters per report are served by `get_report_cache_stats`.
+"""
+import hashlib
+import json
+
+import frappe
+from frappe.utils import cint, today
+
+DEFAULT_TTL = 600
+STATS_KEY = "report_cache::stats"
+
+# report -> {doctype: fields whose changes make its results stale (None: any change)}
+REPORT_DEPENDENCIES = {
+    "job_profitability": {
+        "Repair Order": ("docstatus", "customer", "vehicle", "status", "parts_cost", "labor_cost",
+                         "other_charges", "total_job_cost"),
+        "Sales Invoice": None,
+    },
+    "parts_consumption": {"Stock Entry": None},
+    "repeat_repairs": {"Repair Order": ("docstatus", "vehicle", "delivered_on", "problem_summary")},
+    "technician_utilization": {"Timesheet": None},
+    "technician_efficiency": {"Timesheet": None, "Repair Order": ("docstatus", "operations")},
+    "wip_aging": {"Repair Order": ("docstatus", "status", "vehicle", "sla_delivery_by")},
+}
+
+
+def get_cached_result(report, filters, compute):
+    """Return compute(filters) for `report`, from the cache when the same filters ran recently."""
+    filters = frappe._dict(filters or {})
+    key = _result_key(report, filters)
+    result = frappe.cache.get_value(key)
+    if result is not None:
+        _count(report, "hits")
+        return tuple(result)
+
+    _count(report, "misses")
+    result = compute(filters)
+    ttl = cint(frappe.conf.get("report_cache_ttl")) or DEFAULT_TTL
+    frappe.cache.set_value(key, list(result), expires_in_sec=ttl)
+    return result
+
+
+def invalidate_report_cache(doc, method=None):
+    """doc_events handler: drop cached results of reports that read a field `doc` changed."""
+    before = doc.get_doc_before_save()
+    _invalidate([
+        report
+        for report, fields in _reports_reading(doc.doctype)
+        if before is None or fields is None or any(_value(before, f) != _value(doc, f) for f in fields)
+    ])
+
+
+def invalidate_deleted(doc, method=None):
+    """doc_events on_trash handler: a deleted document drops every report reading its doctype."""
+    invalidate_reports_reading(doc.doctype)
+
+
+def invalidate_reports_reading(doctype, fields=None):
+    """Drop cached results of reports that read `doctype` (one of its `fields`) once the transaction commits."""
+    _invalidate([
+        report
+        for report, read in _reports_reading(doctype)
+        if fields is None or read is None or set(fields) & set(read)
+    ])
+
+
+def _reports_reading(doctype):
+    return [(report, deps[doctype]) for report, deps in REPORT_DEPENDENCIES.items() if doctype in deps]
+
+
+def _value(doc, field):
+    value = doc.get(field)
+    if isinstance(value, list):
+        # Child rows compare by their data, not by object identity
+        return [
+            {k: v for k, v in row.as_dict(no_default_fields=True).items() if not k.startswith("__")}
+            for row in value
+        ]
+    return value
+
+
+def _invalidate(reports):
+    # One after-commit callback per transaction, however many documents it saves
+    if not reports:
+        return
+    pending = frappe.flags.report_cache_pending
+    if pending is None:
+        pending = frappe.flags.report_cache_pending = set()
+        frappe.db.after_commit.add(_clear_pending)
+        frappe.db.after_rollback.add(lambda: frappe.flags.pop("report_cache_pending", None))
+    pending.update(reports)
+
+
+def _clear_pending():
+    reports = frappe.flags.pop("report_cache_pending", None)
+    if reports:
+        clear_report_cache(reports)
+
+
+def clear_report_cache(reports=None):
+    for report in reports or REPORT_DEPENDENCIES:
+        frappe.cache.set_value(_generation_key(report), frappe.generate_hash(length=10))
+
+
+@frappe.whitelist()
+def get_report_cache_stats():
+    """{report: {hits, misses, hit_rate}} since the counters were last reset."""
+    frappe.only_for("System Manager")
+    # Plain counters: read raw, not through the pickling get_value
+    counts = iter(cint(v) for v in frappe.cache.mget(_all_stats_keys()))
+    stats = {}
+    for report in REPORT_DEPENDENCIES:
+        hits, misses = next(counts), next(counts)
+        stats[report] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits * 100.0 / (hits + misses), 1) if hits + misses else 0,
+        }
+    return stats
+
+
+@frappe.whitelist()
+def reset_report_cache_stats():
+    frappe.only_for("System Manager")
+    frappe.cache.delete(*_all_stats_keys())
+
+
+def _result_key(report, filters):
+    # Today is part of the key: aging and default date windows move with the date
+    normalized = json.dumps(
+        {k: str(v) for k, v in sorted(filters.items()) if v not in (None, "", [], 0, "0")},
+        sort_keys=True,
+    )
+    digest = hashlib.md5(f"{today()}|{normalized}".encode()).hexdigest()
+    generation = frappe.cache.get_value(_generation_key(report)) or "0"
+    return f"report_cache::{report}::{generation}::{digest}"
+
+
+def _generation_key(report):
+    return f"report_cache::generation::{report}"
+
+
+def _stats_key(report, outcome):
+    return frappe.cache.make_key(f"{STATS_KEY}::{report}::{outcome}")
+
+
+def _all_stats_keys():
+    return [_stats_key(report, outcome) for report in REPORT_DEPENDENCIES for outcome in ("hits", "misses")]
+
+
+def _count(report, outcome):
+    frappe.cache.incr(_stats_key(report, outcome))
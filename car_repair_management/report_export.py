@@ -0,0 +1,134 @@
+"""Streaming export of the large car repair reports.
+
+`export_report` enqueues a background job that reads the report query with an
+unbuffered (server-side) cursor, CHUNK_SIZE rows at a time, and appends each
+chunk to a CSV or XLSX file in the private files folder. Memory stays bounded
+by the chunk size whatever the row count. The user is notified with a link to
+the file when it is ready.
+
+Reports opt in by exposing get_export_query(filters) -> (columns, query, params).
+"""
+import csv
+import os
+from itertools import islice
+
+import frappe
+from frappe.utils import now_datetime
+
+CHUNK_SIZE = 5000
+EXPORT_FORMATS = ("CSV", "Excel")
+
+_REPORT_MODULE = "car_repair_management.car_repair_management.report"
+EXPORTABLE_REPORTS = {
+    "Job Profitability Report": f"{_REPORT_MODULE}.job_profitability_report.job_profitability_report.get_export_query",
+    "Parts Consumption: Billable vs FoC": f"{_REPORT_MODULE}.parts_consumption_report.parts_consumption_report.get_export_query",
+    "Parts Consumption Billable vs FoC": f"{_REPORT_MODULE}.parts_consumption_report.parts_consumption_report.get_export_query",
+}
+
+
+@frappe.whitelist()
+def export_report(report_name, filters=None, file_format="CSV"):
+    """Queue a streaming export of `report_name`; the user is notified when the file is ready."""
+    if report_name not in EXPORTABLE_REPORTS:
+        frappe.throw(f"Streaming export is not available for {report_name}")
+    if file_format not in EXPORT_FORMATS:
+        frappe.throw(f"Export format must be one of: {', '.join(EXPORT_FORMATS)}")
+    # Same checks as frappe.desk.query_report.run: the report's roles and its ref doctype
+    report = frappe.get_doc("Report", report_name)
+    if not report.is_permitted():
+        frappe.throw(f"You don't have access to Report: {report_name}", frappe.PermissionError)
+    if not frappe.has_permission(report.ref_doctype, "report"):
+        frappe.throw(f"You don't have permission to get a report on: {report.ref_doctype}", frappe.PermissionError)
+
+    filters = frappe.parse_json(filters) if isinstance(filters, str) else (filters or {})
+    job = frappe.enqueue(
+        "car_repair_management.report_export.run_export",
+        queue="long",
+        timeout=3600,
+        report_name=report_name,
+        filters=filters,
+        file_format=file_format,
+        user=frappe.session.user,
+    )
+    return job.id if job else None
+
+
+def run_export(report_name, filters, file_format, user):
+    """Background job: stream the report rows into a private file and notify `user`."""
+    columns, query, params = frappe.get_attr(EXPORTABLE_REPORTS[report_name])(frappe._dict(filters))
+    fieldnames = [c["fieldname"] for c in columns]
+
+    extension = "xlsx" if file_format == "Excel" else "csv"
+    file_name = f"{frappe.scrub(report_name)}-{now_datetime().strftime('%Y%m%d-%H%M%S')}.{extension}"
+    path = frappe.get_site_path("private", "files", file_name)
+
+    rows = _stream_rows(query, params, fieldnames)
+    headers = [c["label"] for c in columns]
+    count = _write_xlsx(path, report_name, headers, rows) if extension == "xlsx" else _write_csv(path, headers, rows)
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+        "file_size": os.path.getsize(path),
+    }).insert(ignore_permissions=True)
+    frappe.get_doc({
+        "doctype": "Notification Log",
+        "for_user": user,
+        "from_user": user,
+        "type": "Alert",
+        "document_type": "File",
+        "document_name": file_doc.name,
+        "subject": f"{report_name} export is ready ({count} rows): {file_name}",
+    }).insert(ignore_permissions=True)
+    frappe.db.commit()
+    frappe.publish_realtime(
+        "report_export_ready",
+        {"report_name": report_name, "file_url": file_doc.file_url, "rows": count},
+        user=user,
+    )
+    return file_doc.name
+
+
+def _stream_rows(query, params, fieldnames):
+    """Yield report rows as lists, fetched CHUNK_SIZE at a time from a server-side cursor."""
+    unbuffered = getattr(frappe.db, "unbuffered_cursor", None)
+    if unbuffered is None:
+        # No server-side cursor on this database backend: page through the query instead
+        offset = 0
+        while True:
+            chunk = frappe.db.sql(f"{query} limit {CHUNK_SIZE} offset {offset}", params, as_dict=True)
+            yield from ([row.get(f) for f in fieldnames] for row in chunk)
+            if len(chunk) < CHUNK_SIZE:
+                return
+            offset += CHUNK_SIZE
+
+    with unbuffered():
+        result = frappe.db.sql(query, params, as_dict=True, as_iterator=True)
+        while chunk := list(islice(result, CHUNK_SIZE)):
+            yield from ([row.get(f) for f in fieldnames] for row in chunk)
+
+
+def _write_csv(path, headers, rows):
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+    return count
+
+
+def _write_xlsx(path, sheet_name, headers, rows):
+    from openpyxl import Workbook
+
+    # Write-only workbooks stream rows to disk instead of keeping cells in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31].replace(":", ""))
+    sheet.append(headers)
+    count = 0
+    for count, row in enumerate(rows, start=1):
+        sheet.append(row)
+    workbook.save(path)
+    return count
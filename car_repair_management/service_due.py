@@ -0,0 +1,195 @@
+"""Fleet-wide next service due date prediction.
+
+A scheduled batch job estimates every Vehicle's next service date from three
+sources and stores the earliest on `next_service_due_date`:
+
+- mileage: km/day from a least-squares fit over the vehicle's odometer
+  readings (submitted Vehicle Logs plus the reading at its last service),
+  projected to `odometer_at_last_service + service_interval_km`
+- visit cadence: the average gap between its delivered Repair Orders
+- time: `last_service_date + service_interval_days`
+
+Intervals come from site config (`service_interval_km`, `service_interval_days`).
+The fit runs over all vehicles at once with NumPy when installed
+(`pip install car_repair_management[capacity]`); otherwise the same sums are
+accumulated in plain Python. Changed dates are written back in bulk.
+"""
+import math
+import time
+
+import frappe
+from frappe.utils import add_days, cint, date_diff, getdate, today
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_INTERVAL_KM = 10000
+DEFAULT_INTERVAL_DAYS = 365
+HISTORY_DAYS = 730
+WRITE_CHUNK_SIZE = 1000
+
+
+def update_next_service_due_dates():
+    """Scheduler entry point: predict and store next_service_due_date for the whole fleet."""
+    started = time.monotonic()
+    base = getdate(today())
+    interval_km = cint(frappe.conf.get("service_interval_km")) or DEFAULT_INTERVAL_KM
+    interval_days = cint(frappe.conf.get("service_interval_days")) or DEFAULT_INTERVAL_DAYS
+
+    vehicles = frappe.db.sql(
+        """
+        select name, last_service_date, odometer_at_last_service, next_service_due_date
+        from `tabVehicle`
+        order by name
+        """,
+        as_dict=True,
+    )
+    row_of = {v.name: idx for idx, v in enumerate(vehicles)}
+    services = [
+        (idx, date_diff(v.last_service_date, base), v.odometer_at_last_service or None)
+        for idx, v in enumerate(vehicles) if v.last_service_date
+    ]
+    readings, visits = _get_history(row_of, base)
+
+    due = _predict(len(vehicles), readings, services, visits, interval_km, interval_days)
+
+    changes = {}
+    for v, offset in zip(vehicles, due):
+        due_date = add_days(base, offset) if offset is not None else None
+        if due_date != (getdate(v.next_service_due_date) if v.next_service_due_date else None):
+            changes[v.name] = due_date
+    _write_due_dates(changes)
+    frappe.db.commit()
+
+    stats = {"vehicles": len(vehicles), "updated": len(changes), "elapsed": round(time.monotonic() - started, 2)}
+    frappe.logger("car_repair_management").info(f"Next service due dates: {stats}")
+    return stats
+
+
+def _predict(n, readings, services, visits, interval_km, interval_days):
+    """Due date per vehicle as a day offset from today (None when nothing is known).
+
+    readings: [(row, day, odometer)], services: [(row, day, odometer or None)],
+    visits: [(row, day)] of delivered Repair Orders; days are offsets from today.
+    """
+    readings = readings + [(row, day, odo) for row, day, odo in services if odo]
+    if np is not None:
+        return _predict_numpy(n, readings, services, visits, interval_km, interval_days)
+    return _predict_python(n, readings, services, visits, interval_km, interval_days)
+
+
+def _predict_numpy(n, readings, services, visits, interval_km, interval_days):
+    due = np.full(n, np.inf)
+    target = np.full(n, np.nan)
+    if services:
+        rows, days, odometers = zip(*services)
+        rows = np.asarray(rows)
+        due[rows] = np.asarray(days, dtype=float) + interval_days
+        target[rows] = np.asarray([o if o else np.nan for o in odometers], dtype=float) + interval_km
+
+    if visits:
+        rows, days = (np.asarray(v) for v in zip(*visits))
+        days = days.astype(float)
+        count = np.bincount(rows, minlength=n)
+        first, last = np.full(n, np.inf), np.full(n, -np.inf)
+        np.minimum.at(first, rows, days)
+        np.maximum.at(last, rows, days)
+        repeat = count > 1
+        cadence = np.divide(last - first, count - 1, out=np.zeros(n), where=repeat)
+        due = np.where(repeat & (cadence > 0), np.minimum(due, last + cadence), due)
+
+    if readings:
+        rows, days, odometers = (np.asarray(v, dtype=float) for v in zip(*readings))
+        rows = rows.astype(int)
+        # Per-vehicle least squares sums, all vehicles in one pass
+        count = np.bincount(rows, minlength=n)
+        sx = np.bincount(rows, days, n)
+        sy = np.bincount(rows, odometers, n)
+        sxx = np.bincount(rows, days * days, n)
+        sxy = np.bincount(rows, days * odometers, n)
+        denom = count * sxx - sx * sx
+        slope = np.divide(count * sxy - sx * sy, denom, out=np.zeros(n), where=denom > 0)
+
+        last_day, last_odometer = np.full(n, -np.inf), np.full(n, -np.inf)
+        np.maximum.at(last_day, rows, days)
+        np.maximum.at(last_odometer, rows, odometers)
+        usable = (slope > 0) & ~np.isnan(target)
+        km_due = np.divide(target - last_odometer, slope, out=np.zeros(n), where=usable) + last_day
+        due = np.where(usable, np.minimum(due, km_due), due)
+
+    return [math.floor(d) if math.isfinite(d) else None for d in due.tolist()]
+
+
+def _predict_python(n, readings, services, visits, interval_km, interval_days):
+    due = [math.inf] * n
+    target = [None] * n
+    for row, day, odometer in services:
+        due[row] = day + interval_days
+        if odometer:
+            target[row] = odometer + interval_km
+
+    spans = {}
+    for row, day in visits:
+        first, last, count = spans.get(row, (day, day, 0))
+        spans[row] = (min(first, day), max(last, day), count + 1)
+    for row, (first, last, count) in spans.items():
+        if count > 1 and last > first:
+            due[row] = min(due[row], last + (last - first) / (count - 1))
+
+    sums = {}
+    for row, day, odometer in readings:
+        count, sx, sy, sxx, sxy, last_day, last_odometer = sums.get(row, (0, 0.0, 0.0, 0.0, 0.0, -math.inf, -math.inf))
+        sums[row] = (count + 1, sx + day, sy + odometer, sxx + day * day, sxy + day * odometer,
+                     max(last_day, day), max(last_odometer, odometer))
+    for row, (count, sx, sy, sxx, sxy, last_day, last_odometer) in sums.items():
+        denom = count * sxx - sx * sx
+        slope = (count * sxy - sx * sy) / denom if denom > 0 else 0
+        if slope > 0 and target[row] is not None:
+            due[row] = min(due[row], last_day + (target[row] - last_odometer) / slope)
+
+    return [math.floor(d) if math.isfinite(d) else None for d in due]
+
+
+def _get_history(row_of, base):
+    """Odometer readings and delivered RO days of the last HISTORY_DAYS, as offsets from `base`."""
+    since = add_days(base, -HISTORY_DAYS)
+    readings = [
+        (row_of[vehicle], date_diff(day, base), odometer)
+        for vehicle, day, odometer in frappe.db.sql(
+            """
+            select license_plate, date, odometer
+            from `tabVehicle Log`
+            where docstatus = 1 and date >= %s and odometer > 0
+            """,
+            since,
+        )
+        if vehicle in row_of
+    ]
+    visits = [
+        (row_of[vehicle], date_diff(day, base))
+        for vehicle, day in frappe.db.sql(
+            """
+            select vehicle, date(delivered_on)
+            from `tabRepair Order`
+            where docstatus = 1 and delivered_on >= %s and ifnull(vehicle, '') != ''
+            """,
+            since,
+        )
+        if vehicle in row_of
+    ]
+    return readings, visits
+
+
+def _write_due_dates(changes):
+    """Store {vehicle: date or None} with one CASE update per chunk."""
+    names = list(changes)
+    for start in range(0, len(names), WRITE_CHUNK_SIZE):
+        chunk = names[start:start + WRITE_CHUNK_SIZE]
+        frappe.db.sql(
+            "update `tabVehicle` set next_service_due_date = case name {} end where name in %s".format(
+                " ".join(["when %s then %s"] * len(chunk))
+            ),
+            [value for name in chunk for value in (name, changes[name])] + [tuple(chunk)],
+        )
@@ -0,0 +1,199 @@
+"""Sharded execution of Repair Order maintenance jobs.
+
+Repair Order names are split into contiguous ranges, one background job per
+range on the long queue. Progress is tracked on a Repair Maintenance Run and
+failed shards are retried on their own.
+
+The target method is called as method(ro_names=[...], **kwargs) once per
+chunk of a shard, and each chunk is committed separately together with the
+shard's heartbeat. `requeue_stale_shards` treats a Running shard whose
+heartbeat is older than the stale timeout (its worker was killed) as a failed
+attempt, so it is retried or marked Failed. An optional
+`on_complete` method is called with run_name once, when the last shard
+completes; it is not called for a run with failed shards until they are
+retried successfully.
+"""
+import json
+
+import frappe
+from frappe.utils import add_to_date, cint, now, now_datetime
+
+RUN_DOCTYPE = "Repair Maintenance Run"
+SHARD_DOCTYPE = "Repair Maintenance Shard"
+DEFAULT_SHARDS = 8
+CHUNK_SIZE = 1000
+# A Running shard without a heartbeat for this long is considered dead
+DEFAULT_STALE_MINUTES = 30
+
+
+def run_sharded(method, shards=DEFAULT_SHARDS, queue="long", max_attempts=3, filters=None, on_complete=None,
+                **kwargs):
+    """Partition Repair Orders matching `filters` into `shards` ranges and enqueue each one.
+
+    Returns the name of the Repair Maintenance Run tracking progress.
+    """
+    # Taken before the selection, so anything modified after started_at may not be in this run
+    started_at = now()
+    names = frappe.get_all("Repair Order", filters=filters or {}, pluck="name", order_by="name")
+    shards = max(1, min(cint(shards) or DEFAULT_SHARDS, len(names) or 1))
+    size = -(-len(names) // shards) if names else 0
+
+    run = frappe.get_doc({
+        "doctype": RUN_DOCTYPE,
+        "method": method,
+        "queue": queue,
+        "max_attempts": max_attempts,
+        "kwargs": json.dumps(kwargs),
+        "on_complete": on_complete,
+        "status": "Running" if names else "Completed",
+        "total_ros": len(names),
+        "started_at": started_at,
+        "finished_at": None if names else now(),
+    })
+    for idx, start in enumerate(range(0, len(names), size or 1)):
+        chunk = names[start:start + size]
+        run.append("shards", {
+            "shard_index": idx,
+            "first_repair_order": chunk[0],
+            "last_repair_order": chunk[-1],
+            "ro_count": len(chunk),
+            "status": "Queued",
+        })
+    run.total_shards = len(run.shards)
+    run.insert(ignore_permissions=True)
+
+    for shard in run.shards:
+        _enqueue_shard(run, shard.name)
+    if not names and on_complete:
+        frappe.get_attr(on_complete)(run_name=run.name)
+    return run.name
+
+
+def _enqueue_shard(run, shard_name, attempt=1):
+    # The attempt is part of the job id so a retry is not deduplicated against
+    # the still-running job that enqueues it
+    frappe.enqueue(
+        "car_repair_management.sharding.run_shard",
+        queue=run.queue or "long",
+        job_id=f"{run.name}::{shard_name}::{attempt}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        run_name=run.name,
+        shard_name=shard_name,
+    )
+
+
+def run_shard(run_name, shard_name):
+    """Worker entry point for one shard."""
+    run = frappe.get_doc(RUN_DOCTYPE, run_name)
+    shard = next(iter(run.get("shards", {"name": shard_name})), None)
+    if not shard or shard.status == "Completed":
+        return
+
+    attempts = cint(shard.attempts) + 1
+    frappe.db.set_value(SHARD_DOCTYPE, shard_name, {"status": "Running", "attempts": attempts, "heartbeat": now()})
+    frappe.db.commit()
+
+    method = frappe.get_attr(run.method)
+    kwargs = json.loads(run.kwargs or "{}")
+    try:
+        names = frappe.get_all(
+            "Repair Order",
+            filters=[
+                ["name", ">=", shard.first_repair_order],
+                ["name", "<=", shard.last_repair_order],
+            ],
+            pluck="name",
+            order_by="name",
+        )
+        for start in range(0, len(names), CHUNK_SIZE):
+            method(ro_names=names[start:start + CHUNK_SIZE], **kwargs)
+            frappe.db.set_value(SHARD_DOCTYPE, shard_name, "heartbeat", now())
+            frappe.db.commit()
+    except Exception:
+        frappe.db.rollback()
+        _fail_attempt(run, shard_name, attempts, frappe.get_traceback())
+    else:
+        frappe.db.set_value(SHARD_DOCTYPE, shard_name, {
+            "status": "Completed",
+            "error": None,
+            "finished_at": now(),
+        })
+        frappe.db.commit()
+
+    _update_progress(run_name)
+
+
+def _fail_attempt(run, shard_name, attempts, error):
+    """Re-enqueue the shard while it has attempts left, else mark it Failed."""
+    retry = attempts < cint(run.max_attempts)
+    frappe.db.set_value(SHARD_DOCTYPE, shard_name, {
+        "status": "Queued" if retry else "Failed",
+        "error": error,
+        "finished_at": None if retry else now(),
+    })
+    frappe.db.commit()
+    if retry:
+        _enqueue_shard(run, shard_name, attempts + 1)
+
+
+def requeue_stale_shards():
+    """Scheduler entry point: fail the current attempt of shards whose worker stopped heartbeating."""
+    minutes = cint(frappe.conf.get("repair_shard_stale_minutes")) or DEFAULT_STALE_MINUTES
+    stale = frappe.db.sql(
+        """
+        select name, parent, attempts, heartbeat
+        from `tabRepair Maintenance Shard`
+        where parenttype = %s and status = 'Running' and ifnull(heartbeat, modified) < %s
+        """,
+        (RUN_DOCTYPE, add_to_date(now_datetime(), minutes=-minutes)),
+        as_dict=True,
+    )
+    for shard in stale:
+        run = frappe.get_doc(RUN_DOCTYPE, shard.parent)
+        error = f"No heartbeat since {shard.heartbeat}; worker presumed dead"
+        _fail_attempt(run, shard.name, cint(shard.attempts), error)
+        _update_progress(run.name)
+    return len(stale)
+
+
+def _update_progress(run_name):
+    """Roll shard states up to the run; safe to call concurrently from any shard."""
+    # The row lock makes exactly one shard see the run turn Completed
+    run = frappe.db.get_value(RUN_DOCTYPE, run_name, ["status", "on_complete"], as_dict=True, for_update=True)
+    counts = dict(frappe.db.sql(
+        """
+        select status, count(*)
+        from `tabRepair Maintenance Shard`
+        where parent = %s and parenttype = %s
+        group by status
+        """,
+        (run_name, RUN_DOCTYPE),
+    ))
+    total = sum(counts.values())
+    completed, failed = counts.get("Completed", 0), counts.get("Failed", 0)
+    values = {"completed_shards": completed, "failed_shards": failed}
+    if completed == total:
+        values.update(status="Completed", finished_at=now())
+    elif completed + failed == total:
+        values.update(status="Failed", finished_at=now())
+    else:
+        values["status"] = "Running"
+    frappe.db.set_value(RUN_DOCTYPE, run_name, values)
+    if run.on_complete and run.status != "Completed" and values["status"] == "Completed":
+        frappe.get_attr(run.on_complete)(run_name=run_name)
+    frappe.db.commit()
+
+
+@frappe.whitelist()
+def retry_failed_shards(run_name):
+    """Re-enqueue every failed shard of a run, with a fresh attempt budget."""
+    frappe.only_for("System Manager")
+    run = frappe.get_doc(RUN_DOCTYPE, run_name)
+    failed = [s.name for s in run.shards if s.status == "Failed"]
+    for shard_name in failed:
+        frappe.db.set_value(SHARD_DOCTYPE, shard_name, {"status": "Queued", "attempts": 0})
+        _enqueue_shard(run, shard_name)
+    if failed:
+        frappe.db.set_value(RUN_DOCTYPE, run_name, {"status": "Running", "finished_at": None})
+    return len(failed)
@@ -1,19 +1,116 @@
+import time
+
 import frappe
+from frappe.utils import getdate, now
+
+from car_repair_management.car_repair_management.doctype.job_costing_history.job_costing_history import (
+    record_cost_history,
+)
+from car_repair_management.sharding import run_sharded
+
+# Global default holding the `modified` high-water mark of the last snapshot run
+JOB_COSTING_HWM_KEY = "car_repair_job_costing_hwm"
+SNAPSHOT_CHUNK_SIZE = 1000
+
+
+def update_job_costing_snapshots(full=False):
+    """Upsert Job Costing snapshots for ROs modified since the last run.
+
+    With `full` every RO is rebuilt through sharded background jobs instead,
+    and the name of the Repair Maintenance Run tracking them is returned.
+    """
+    if full:
+        # The mark moves only once every shard has succeeded
+        return run_sharded(
+            "car_repair_management.tasks.upsert_job_costing_snapshots",
+            on_complete="car_repair_management.tasks.set_job_costing_hwm_from_run",
+        )
+
+    started = time.monotonic()
+    since = frappe.db.get_global(JOB_COSTING_HWM_KEY)
+    # Taken before the rows are selected: rows modified from here on are picked up next time
+    run_started_at = now()
+    names = frappe.get_all(
+        "Repair Order",
+        filters={"modified": [">", since]} if since else {},
+        pluck="name",
+        order_by="name",
+    )
+    for start in range(0, len(names), SNAPSHOT_CHUNK_SIZE):
+        upsert_job_costing_snapshots(names[start:start + SNAPSHOT_CHUNK_SIZE])
+        frappe.db.commit()
+
+    # Written only once every chunk is committed
+    frappe.db.set_global(JOB_COSTING_HWM_KEY, run_started_at)
+    frappe.db.commit()
+
+    stats = {"processed": len(names), "elapsed": round(time.monotonic() - started, 2)}
+    frappe.logger("car_repair_management").info(f"Job Costing snapshots: {stats}")
+    return stats
+
+
+def set_job_costing_hwm_from_run(run_name):
+    """on_complete of a full rebuild: its ROs were selected when the run started."""
+    started_at = frappe.db.get_value("Repair Maintenance Run", run_name, "started_at")
+    frappe.db.set_global(JOB_COSTING_HWM_KEY, str(started_at))
+
+
+def upsert_job_costing_snapshots(ro_names):
+    """Create or refresh Job Costing rows for `ro_names` with two set-based statements."""
+    if not ro_names:
+        return
+    values = {
+        "names": tuple(ro_names),
+        "now": now(),
+        "user": frappe.session.user,
+        "yy": getdate().strftime("%y"),
+    }
+    # Refresh existing snapshots, skipping rows that already match
+    frappe.db.sql(
+        """
+        update `tabJob Costing` jc
+        join `tabRepair Order` ro on ro.name = jc.repair_order
+        set jc.project = ro.project,
+            jc.vehicle = ro.vehicle,
+            jc.parts_cost = ifnull(ro.parts_cost, 0),
+            jc.labor_cost = ifnull(ro.labor_cost, 0),
+            jc.other_charges = ifnull(ro.other_charges, 0),
+            jc.total_job_cost = ifnull(ro.total_job_cost, 0),
+            jc.margin_snapshot = ifnull(ro.gross_margin, 0),
+            jc.modified = %(now)s,
+            jc.modified_by = %(user)s
+        where ro.name in %(names)s
+            and not (jc.project <=> ro.project
+                and jc.vehicle <=> ro.vehicle
+                and jc.parts_cost = ifnull(ro.parts_cost, 0)
+                and jc.labor_cost = ifnull(ro.labor_cost, 0)
+                and jc.other_charges = ifnull(ro.other_charges, 0)
+                and jc.total_job_cost = ifnull(ro.total_job_cost, 0)
+                and jc.margin_snapshot = ifnull(ro.gross_margin, 0))
+        """,
+        values,
+    )
+    # Insert missing ones, named like the Job Costing autoname (JB-COST-{repair_order}-{YY})
+    frappe.db.sql(
+        """
+        insert into `tabJob Costing`
+            (name, creation, modified, owner, modified_by, docstatus, idx,
+             repair_order, project, vehicle, parts_cost, labor_cost, other_charges,
+             total_job_cost, margin_snapshot)
+        select concat('JB-COST-', ro.name, '-', %(yy)s), %(now)s, %(now)s, %(user)s, %(user)s, 0, 0,
+            ro.name, ro.project, ro.vehicle, ifnull(ro.parts_cost, 0), ifnull(ro.labor_cost, 0),
+            ifnull(ro.other_charges, 0), ifnull(ro.total_job_cost, 0), ifnull(ro.gross_margin, 0)
+        from `tabRepair Order` ro
+        left join `tabJob Costing` jc on jc.repair_order = ro.name
+        where ro.name in %(names)s and jc.name is null
+        """,
+        values,
+    )
+    record_cost_history(ro_names)
+
 
-def update_job_costing_snapshots():
-    # Iterate Repair Orders and update/create Job Costing snapshot
-    ros = frappe.get_all("Repair Order", fields=["name", "project", "vehicle", "parts_cost", "labor_cost", "other_charges", "total_job_cost"])
-    for ro in ros:
-        jc = frappe.get_all("Job Costing", filters={"repair_order": ro.name}, limit=1)
-        if jc:
-            doc = frappe.get_doc("Job Costing", jc[0].name)
-        else:
-            doc = frappe.get_doc({"doctype": "Job Costing"})
-            doc.repair_order = ro.name
-        doc.project = ro.project
-        doc.vehicle = ro.vehicle
-        doc.parts_cost = ro.parts_cost
-        doc.labor_cost = ro.labor_cost
-        doc.other_charges = ro.other_charges
-        doc.margin_snapshot = 0
-        doc.save(ignore_permissions=True)
+@frappe.whitelist()
+def rebuild_job_costing_snapshots():
+    """Rebuild every Job Costing snapshot in sharded background jobs."""
+    frappe.only_for("System Manager")
+    return update_job_costing_snapshots(full=True)
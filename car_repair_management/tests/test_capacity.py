@@ -0,0 +1,29 @@
+import unittest
+
+from car_repair_management import capacity
+
+# 2 employees x 5 days: employee 0 moves to a 6h shift from day 2 and has a
+# holiday on day 3; employee 1 has no holiday list and joins on day 1
+MATRIX = dict(
+    n_emp=2,
+    days=5,
+    base=[8.0, 4.0],
+    spans=[(0, 2, 5, 6.0), (1, 0, 1, 0.0)],
+    n_lists=1,
+    holidays=[(0, 3)],
+    list_of=[0, -1],
+    log_cells=[(0, 0, 3.0), (1, 4, 2.0), (0, 1, 1.0)],
+)
+
+
+class TestCapacity(unittest.TestCase):
+    def test_reduce_python(self):
+        capacity_hours, logged = capacity._reduce_python(**MATRIX)
+        self.assertEqual(list(capacity_hours), [28.0, 16.0])
+        self.assertEqual(list(logged), [4.0, 2.0])
+
+    @unittest.skipIf(capacity.np is None, "numpy not installed")
+    def test_reduce_numpy_matches_python(self):
+        expected = capacity._reduce_python(**MATRIX)
+        result = capacity._reduce_numpy(**MATRIX)
+        self.assertEqual([list(r) for r in result], [list(r) for r in expected])
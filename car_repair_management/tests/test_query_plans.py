@@ -0,0 +1,11 @@
+import frappe
+import unittest
+
+from car_repair_management.install import _create_indexes
+from car_repair_management.query_plans import get_full_scans
+
+
+class TestQueryPlans(unittest.TestCase):
+    def test_shipped_queries_use_indexes(self):
+        _create_indexes()
+        self.assertEqual(get_full_scans(), [])
@@ -6,29 +6,9 @@ class TestRepairOrder(unittest.TestCase):
         frappe.flags.test_roles = ['System Manager']
 
     def test_repair_order_flow(self):
-        # Ensure Customer
-        if not frappe.db.exists('Customer', 'Test Car Customer'):
-            frappe.get_doc({
-                'doctype': 'Customer',
-                'customer_name': 'Test Car Customer',
-                'customer_type': 'Individual'
-            }).insert()
-
-        # Ensure Vehicle (from ERPNext vehicle doctype)
         vehicle_name = 'TEST-VEH-001'
-        if not frappe.db.exists('Vehicle', vehicle_name):
-            # Ensure UOM for odometer
-            if not frappe.db.exists('UOM', 'Km'):
-                frappe.get_doc({'doctype': 'UOM', 'uom_name': 'Km'}).insert()
-            frappe.get_doc({
-                'doctype': 'Vehicle',
-                'license_plate': vehicle_name,
-                'make': 'TestMake',
-                'model': 'TestModel',
-                'owner': 'Test Car Customer',
-                'uom': 'Km',
-                'last_odometer': 0,
-            }).insert()
+        _ensure_customer()
+        _ensure_vehicle(vehicle_name)
 
         # Service Template
         st_name = 'Basic Service'
@@ -89,6 +69,49 @@ class TestRepairOrder(unittest.TestCase):
         mr = frappe.get_doc(frappe.call('car_repair_management.car_repair_management.doctype.repair_order.repair_order.make_material_request_from_repair_order', name=ro.name))
         self.assertGreater(len(mr.items), 0)
 
+    def test_item_details_batched(self):
+        from car_repair_management.car_repair_management.doctype.repair_order.repair_order import _get_item_details
+        item_a = _ensure_stock_item('Test Item A')
+        item_b = _ensure_stock_item('Test Item B')
+        details = _get_item_details([item_a, item_b, item_a, None])
+        self.assertEqual(set(details), {item_a, item_b})
+        self.assertEqual(details[item_a].stock_uom, 'Nos')
+        self.assertEqual(details[item_b].item_name, 'Test Item B')
+
+    def test_task_counters(self):
+        from car_repair_management.car_repair_management.doctype.repair_order.task_routing import (
+            reconcile_task_counters,
+        )
+
+        ro = make_repair_order(operations=['Brakes', 'Oil Change'], submit=True)
+        other = make_repair_order(submit=True)
+        tasks = frappe.get_all('Task', filters={'repair_order': ro.name}, pluck='name', order_by='name')
+
+        def counters(name):
+            return tuple(frappe.db.get_value('Repair Order', name, ['open_tasks', 'closed_tasks']))
+
+        self.assertEqual(counters(ro.name), (2, 0))
+
+        task = frappe.get_doc('Task', tasks[0])
+        task.status = 'Completed'
+        task.save()
+        self.assertEqual(counters(ro.name), (1, 1))
+
+        # Moving a task carries its count to the other RO
+        task.repair_order = other.name
+        task.save()
+        self.assertEqual(counters(ro.name), (1, 0))
+        self.assertEqual(counters(other.name), (0, 1))
+
+        frappe.delete_doc('Task', tasks[1], force=True)
+        self.assertEqual(counters(ro.name), (0, 0))
+
+        # Writes that skip doc events are repaired by the recount
+        frappe.db.set_value('Task', task.name, 'repair_order', ro.name)
+        self.assertEqual(len(reconcile_task_counters(ro.name, verify_only=True)), 1)
+        reconcile_task_counters(ro.name)
+        self.assertEqual(counters(ro.name), (0, 1))
+
 
 def _ensure_operation(operation_name: str) -> str:
     if not frappe.db.exists('Operation', operation_name):
@@ -115,3 +138,47 @@ def _ensure_stock_item(item_name: str) -> str:
             'item_group': 'All Item Groups'
         }).insert()
     return item_code
+
+
+def _ensure_customer() -> str:
+    if not frappe.db.exists('Customer', 'Test Car Customer'):
+        frappe.get_doc({
+            'doctype': 'Customer',
+            'customer_name': 'Test Car Customer',
+            'customer_type': 'Individual'
+        }).insert()
+    return 'Test Car Customer'
+
+
+def _ensure_vehicle(vehicle_name: str) -> str:
+    # ERPNext Vehicle, odometer in Km
+    if not frappe.db.exists('Vehicle', vehicle_name):
+        if not frappe.db.exists('UOM', 'Km'):
+            frappe.get_doc({'doctype': 'UOM', 'uom_name': 'Km'}).insert()
+        frappe.get_doc({
+            'doctype': 'Vehicle',
+            'license_plate': vehicle_name,
+            'make': 'TestMake',
+            'model': 'TestModel',
+            'owner': 'Test Car Customer',
+            'uom': 'Km',
+            'last_odometer': 0,
+        }).insert()
+    return vehicle_name
+
+
+def make_repair_order(vehicle='TEST-VEH-001', operations=(), submit=False, **fields):
+    """Draft (or submitted) Repair Order for the test customer, one row per operation name."""
+    ro = frappe.get_doc({
+        'doctype': 'Repair Order',
+        'customer': _ensure_customer(),
+        'vehicle': _ensure_vehicle(vehicle),
+        'priority': 'Normal',
+        **fields,
+    })
+    for operation_name in operations:
+        ro.append('operations', {'operation_name': operation_name, 'planned_minutes': 30})
+    ro.insert()
+    if submit:
+        ro.submit()
+    return ro
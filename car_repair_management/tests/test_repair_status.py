@@ -0,0 +1,67 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import set_request
+from frappe.website.serve import get_response
+
+from car_repair_management.repair_status import PAGE_CACHE_KEY, get_portal_room, get_repair_statuses
+from car_repair_management.tests.test_repair_order import make_repair_order
+
+
+class TestRepairStatusPage(FrappeTestCase):
+    def setUp(self):
+        self.repair_orders = [make_repair_order(), make_repair_order()]
+
+    def tearDown(self):
+        frappe.set_user("Administrator")
+        for ro in self.repair_orders:
+            frappe.cache.delete_value(PAGE_CACHE_KEY.format(ro.name))
+
+    def render_as_guest(self, name):
+        set_request(method="GET", path=f"repair_status/{name}")
+        response = get_response()
+        self.assertEqual(response.status_code, 200)
+        return response.get_data(as_text=True)
+
+    def test_guest_pages_are_cached_per_repair_order(self):
+        first, second = (ro.name for ro in self.repair_orders)
+        frappe.set_user("Guest")
+
+        first_html = self.render_as_guest(first)
+        second_html = self.render_as_guest(second)
+        self.assertIn(heading(first), first_html)
+        self.assertNotIn(heading(second), first_html)
+        self.assertIn(heading(second), second_html)
+        self.assertNotIn(heading(first), second_html)
+
+        # Served from the cache of the requested RO, not the one rendered last
+        self.assertIsNotNone(frappe.cache.get_value(PAGE_CACHE_KEY.format(first)))
+        self.assertIn(heading(first), self.render_as_guest(first))
+
+    def test_guest_page_carries_its_own_portal_room(self):
+        first, second = (ro.name for ro in self.repair_orders)
+        self.assertNotEqual(get_portal_room(first), get_portal_room(second))
+        self.assertNotIn(first, get_portal_room(first))
+
+        frappe.set_user("Guest")
+        html = self.render_as_guest(first)
+        self.assertIn(get_portal_room(first), html)
+        self.assertNotIn(get_portal_room(second), html)
+
+    def test_cursor_does_not_skip_ros_saved_in_the_same_instant(self):
+        names = sorted(ro.name for ro in self.repair_orders)
+        for name in names:
+            frappe.db.set_value("Repair Order", name, "modified", "2025-01-01 10:00:00", update_modified=False)
+
+        first_page = get_repair_statuses(repair_orders=names)
+        self.assertEqual([r.name for r in first_page["repair_orders"]], names)
+
+        # A cursor pointing at the first RO still returns the second one, saved at the same time
+        cursor = f"2025-01-01 10:00:00|{names[0]}"
+        poll = get_repair_statuses(repair_orders=names, since=cursor)
+        self.assertEqual([r.name for r in poll["repair_orders"]], names[1:])
+        self.assertEqual(get_repair_statuses(repair_orders=names, since=poll["cursor"])["repair_orders"], [])
+
+
+def heading(name):
+    # The full heading, so one RO name being a prefix of the other does not match
+    return f"<h2>Repair Order {name}</h2>"
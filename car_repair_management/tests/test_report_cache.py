@@ -0,0 +1,47 @@
+import frappe
+import unittest
+
+from car_repair_management.report_cache import (
+    _clear_pending,
+    clear_report_cache,
+    get_cached_result,
+    invalidate_reports_reading,
+)
+
+
+class TestReportCache(unittest.TestCase):
+    def setUp(self):
+        clear_report_cache(["wip_aging"])
+        self.calls = []
+
+    def compute(self, filters):
+        self.calls.append(filters)
+        return [], [{"n": len(self.calls)}], None, None
+
+    def test_same_filters_hit_cache(self):
+        first = get_cached_result("wip_aging", {"status": "Scheduled", "page": None}, self.compute)
+        second = get_cached_result("wip_aging", {"status": "Scheduled"}, self.compute)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(first[1], second[1])
+
+        get_cached_result("wip_aging", {"status": "On Hold"}, self.compute)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_clear_invalidates(self):
+        get_cached_result("wip_aging", {}, self.compute)
+        clear_report_cache(["wip_aging"])
+        get_cached_result("wip_aging", {}, self.compute)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_invalidates_only_reports_reading_changed_fields(self):
+        get_cached_result("wip_aging", {}, self.compute)
+        invalidate_reports_reading("Repair Order", ["problem_summary"])
+        invalidate_reports_reading("Repair Order", ["labor_cost"])
+        _clear_pending()
+        get_cached_result("wip_aging", {}, self.compute)
+        self.assertEqual(len(self.calls), 1)
+
+        invalidate_reports_reading("Repair Order", ["status"])
+        _clear_pending()
+        get_cached_result("wip_aging", {}, self.compute)
+        self.assertEqual(len(self.calls), 2)
@@ -0,0 +1,30 @@
+import unittest
+
+from car_repair_management import service_due
+
+# Vehicle 0 drives 50 km/day from a service at 50,000 km 100 days ago;
+# vehicle 1 comes in every 100 days; vehicle 2 has no history
+HISTORY = dict(
+    n=3,
+    readings=[(0, -50, 52500), (0, 0, 55000)],
+    services=[(0, -100, 50000), (1, -100, None)],
+    visits=[(1, -300), (1, -200), (1, -100)],
+    interval_km=10000,
+    interval_days=365,
+)
+
+
+class TestServiceDue(unittest.TestCase):
+    def test_predict_python(self):
+        self.assertEqual(service_due._predict_python(**_with_service_readings(HISTORY)), [100, 0, None])
+
+    @unittest.skipIf(service_due.np is None, "numpy not installed")
+    def test_predict_numpy_matches_python(self):
+        history = _with_service_readings(HISTORY)
+        self.assertEqual(service_due._predict_numpy(**history), service_due._predict_python(**history))
+
+
+def _with_service_readings(history):
+    # _predict adds the reading taken at the last service to the fit
+    readings = history["readings"] + [(row, day, odo) for row, day, odo in history["services"] if odo]
+    return dict(history, readings=readings)
@@ -0,0 +1,133 @@
+"""Vehicle service rollups (jobs_count, repair_cost_to_date, revenue_billed_to_date,
+last_service_date, odometer_at_last_service).
+
+Kept up to date incrementally from Repair Order and Sales Invoice events with
+single-row UPDATEs; `rebuild_vehicle_rollups` recomputes them from source with
+one grouped statement per source table.
+
+- jobs_count: submitted Repair Orders
+- repair_cost_to_date, last_service_date: delivered Repair Orders; cost changes of an
+  RO after its delivery are posted as deltas by `on_delivered_cost_change`
+- odometer_at_last_service: the Vehicle's last_odometer when an RO is delivered
+- revenue_billed_to_date: net amount of submitted Sales Invoice items, by the item's
+  vehicle or that of its Repair Order
+"""
+import frappe
+from frappe.utils import flt, getdate
+
+
+def on_repair_order_submit(doc, method=None):
+    if doc.vehicle:
+        _increment(doc.vehicle, jobs_count=1)
+
+
+def on_repair_order_cancel(doc, method=None):
+    # Cancelling may remove the latest delivery, which can't be undone by a delta
+    if doc.vehicle:
+        recompute_vehicle_rollups([doc.vehicle])
+
+
+def on_repair_order_delivered(doc):
+    """Called once per RO when its status first becomes Delivered."""
+    if not doc.vehicle:
+        return
+    frappe.db.sql(
+        """
+        update `tabVehicle`
+        set repair_cost_to_date = ifnull(repair_cost_to_date, 0) + %(cost)s,
+            last_service_date = greatest(ifnull(last_service_date, %(date)s), %(date)s),
+            odometer_at_last_service = ifnull(last_odometer, odometer_at_last_service)
+        where name = %(vehicle)s
+        """,
+        {"vehicle": doc.vehicle, "cost": flt(doc.total_job_cost), "date": getdate(doc.delivered_on)},
+    )
+
+
+def on_delivered_cost_change(ro, old_cost):
+    """Post the change of a delivered RO's total_job_cost (recomputed after delivery) to its Vehicle."""
+    delta = flt(ro.total_job_cost) - flt(old_cost)
+    if ro.vehicle and ro.docstatus == 1 and ro.delivered_on and delta:
+        _increment(ro.vehicle, repair_cost_to_date=delta)
+
+
+def on_sales_invoice_change(doc, method=None):
+    """Sales Invoice on_submit / on_cancel: add or reverse item net amounts per vehicle."""
+    ro_names = {d.get("repair_order") or doc.get("custom_repair_order") for d in doc.items}
+    ro_vehicles = dict(frappe.get_all(
+        "Repair Order",
+        filters={"name": ["in", [n for n in ro_names if n]]},
+        fields=["name", "vehicle"],
+        as_list=True,
+    )) if any(ro_names) else {}
+
+    sign = -1 if doc.docstatus == 2 else 1
+    revenue = {}
+    for d in doc.items:
+        vehicle = d.get("vehicle") or ro_vehicles.get(d.get("repair_order") or doc.get("custom_repair_order"))
+        if vehicle:
+            revenue[vehicle] = revenue.get(vehicle, 0) + sign * flt(d.net_amount)
+    for vehicle, amount in revenue.items():
+        _increment(vehicle, revenue_billed_to_date=amount)
+
+
+def _increment(vehicle, **deltas):
+    frappe.db.sql(
+        "update `tabVehicle` set {} where name = %(vehicle)s".format(
+            ", ".join(f"{field} = ifnull({field}, 0) + %({field})s" for field in deltas)
+        ),
+        {"vehicle": vehicle, **deltas},
+    )
+
+
+@frappe.whitelist()
+def rebuild_vehicle_rollups(vehicles=None):
+    """Whitelisted, System Manager only: recompute the rollups of every Vehicle (or of `vehicles`)."""
+    frappe.only_for("System Manager")
+    if isinstance(vehicles, str):
+        vehicles = frappe.parse_json(vehicles)
+    recompute_vehicle_rollups(vehicles)
+
+
+def recompute_vehicle_rollups(vehicles=None):
+    """Recompute the rollups of every Vehicle (or of `vehicles`) from source documents."""
+    condition, ro_condition, si_condition, values = "", "", "", {}
+    if vehicles:
+        values["vehicles"] = tuple(vehicles)
+        condition = "where v.name in %(vehicles)s"
+        ro_condition = "and vehicle in %(vehicles)s"
+        si_condition = "and (sii.vehicle in %(vehicles)s or ro.vehicle in %(vehicles)s)"
+
+    frappe.db.sql(
+        f"""
+        update `tabVehicle` v
+        left join (
+            select vehicle, count(*) as jobs_count,
+                sum(case when delivered_on is not null then ifnull(total_job_cost, 0) else 0 end) as repair_cost,
+                max(date(delivered_on)) as last_service_date
+            from `tabRepair Order`
+            where docstatus = 1 and ifnull(vehicle, '') != '' {ro_condition}
+            group by vehicle
+        ) ro on ro.vehicle = v.name
+        set v.jobs_count = ifnull(ro.jobs_count, 0),
+            v.repair_cost_to_date = ifnull(ro.repair_cost, 0),
+            v.last_service_date = ro.last_service_date
+        {condition}
+        """,
+        values,
+    )
+    frappe.db.sql(
+        f"""
+        update `tabVehicle` v
+        left join (
+            select coalesce(nullif(sii.vehicle, ''), ro.vehicle) as vehicle, sum(sii.net_amount) as revenue
+            from `tabSales Invoice Item` sii
+            join `tabSales Invoice` si on si.name = sii.parent
+            left join `tabRepair Order` ro on ro.name = coalesce(nullif(sii.repair_order, ''), si.custom_repair_order)
+            where sii.docstatus = 1 and coalesce(nullif(sii.vehicle, ''), ro.vehicle) is not null {si_condition}
+            group by coalesce(nullif(sii.vehicle, ''), ro.vehicle)
+        ) si on si.vehicle = v.name
+        set v.revenue_billed_to_date = ifnull(si.revenue, 0)
+        {condition}
+        """,
+        values,
+    )